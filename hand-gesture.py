@@ -1,22 +1,2958 @@
-import cv2
-import mediapipe as mp
 import numpy as np
 import tkinter as tk
-from tkinter import ttk
-from PIL import Image, ImageTk
+from tkinter import ttk, filedialog
+from PIL import Image, ImageDraw, ImageTk
 import time
 import json
 import os
+import gc
+import tracemalloc
+import threading
+import socket
+import multiprocessing
+import argparse
+import dataclasses
+from array import array
+from collections import deque
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
+from queue import Empty, Full, SimpleQueue
+from typing import NamedTuple
+
+# OpenCV and MediaPipe take seconds to import, so they are loaded on first use
+# (load_opencv, load_mediapipe) and the window can appear before they are ready
+cv2 = None
+mp = None
+landmark_pb2 = None
+
+
+def load_opencv():
+    """Import OpenCV into the module globals on first use"""
+    global cv2
+    if cv2 is None:
+        import cv2
+    return cv2
+
+
+def load_mediapipe():
+    """Import MediaPipe and its landmark protobufs into the module globals on first use"""
+    global mp, landmark_pb2
+    if mp is None:
+        from mediapipe.framework.formats import landmark_pb2
+        import mediapipe as mp
+    return mp
+
+# Drawing colors shared by the UI buttons, the video palette and the raster canvas
+COLOR_HEX = {
+    "red": "#FF0000",
+    "green": "#00FF00",
+    "blue": "#0000FF",
+    "yellow": "#FFFF00",
+    "black": "#000000",
+    "purple": "#800080",
+    "orange": "#FFA500",
+    "brown": "#A52A2A",
+    "cyan": "#00FFFF",
+}
+
+
+class LatestFrameQueue:
+    """Bounded hand-off queue between pipeline stages.
+
+    drop_policy decides what happens when the queue is full:
+    "oldest" discards the queued item so the newest frame wins,
+    "newest" discards the incoming item, "block" waits for space.
+    """
+    DROP_POLICIES = ("oldest", "newest", "block")
+
+    def __init__(self, maxsize=1, drop_policy="oldest", on_drop=None):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        if drop_policy not in self.DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.maxsize = maxsize
+        self.drop_policy = drop_policy
+        self.on_drop = on_drop
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def put(self, item):
+        """Queue an item, returns False if it was dropped"""
+        with self._cond:
+            if self.drop_policy == "block":
+                self._cond.wait_for(lambda: len(self._items) < self.maxsize or self._closed)
+            if self._closed:
+                dropped = item
+            elif len(self._items) >= self.maxsize:
+                self.dropped += 1
+                if self.drop_policy == "newest":
+                    dropped = item
+                else:
+                    dropped = self._items.popleft()
+                    self._items.append(item)
+            else:
+                dropped = None
+                self._items.append(item)
+            self._cond.notify_all()
+        # Let the owner recycle whatever was discarded (e.g. pooled buffers)
+        if dropped is not None and self.on_drop is not None:
+            self.on_drop(dropped)
+        return dropped is not item
+
+    def get(self, timeout=None):
+        """Wait for an item, returns None on timeout or when closed"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._items or self._closed, timeout)
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def get_nowait(self):
+        return self.get(timeout=0)
+
+    def close(self):
+        """Wake up any waiting producers and consumers"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class RateCounter:
+    """Events per second over a sliding time window"""
+    def __init__(self, window=1.0):
+        self.window = window
+        self._stamps = deque()
+        self._lock = threading.Lock()
+
+    def tick(self):
+        now = time.perf_counter()
+        with self._lock:
+            self._stamps.append(now)
+            self._trim(now)
+
+    def rate(self):
+        now = time.perf_counter()
+        with self._lock:
+            self._trim(now)
+            return len(self._stamps) / self.window
+
+    def _trim(self, now):
+        while self._stamps and now - self._stamps[0] > self.window:
+            self._stamps.popleft()
+
+
+class _Span:
+    """Times one with-block and reports it to its Profiler"""
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+class _NullSpan:
+    """Shared no-op span handed out while profiling is disabled"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Profiler:
+    """Named timing spans with rolling percentiles and Chrome trace export.
+
+    Wrap pipeline stages in ``with profiler.span("name"):``. While disabled,
+    span() returns a shared no-op object, so instrumented code only pays
+    for one attribute check. window bounds how many recent samples each
+    stage keeps (None keeps them all, for benchmarks). With trace=True,
+    every span is also kept as an event for export_chrome_trace().
+    """
+    def __init__(self, enabled=True, window=300, trace=False, max_events=200000):
+        self.enabled = enabled
+        self.window = window
+        self.samples = {}
+        self.counts = {}
+        self.events = deque(maxlen=max_events) if trace else None
+        self._lock = threading.Lock()
+
+    def span(self, name):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def record(self, name, start, end):
+        with self._lock:
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = deque(maxlen=self.window)
+                self.counts[name] = 0
+            samples.append(end - start)
+            self.counts[name] += 1
+            if self.events is not None:
+                self.events.append((name, start, end, threading.get_ident()))
+
+    def reset(self):
+        with self._lock:
+            self.samples.clear()
+            self.counts.clear()
+            if self.events is not None:
+                self.events.clear()
+
+    def summary(self, percentiles=(50, 90, 99)):
+        """Per-stage latency percentiles in milliseconds over the rolling window"""
+        with self._lock:
+            snapshot = {name: (list(samples), self.counts[name]) for name, samples in self.samples.items()}
+        summary = {}
+        for name, (samples, count) in snapshot.items():
+            ms = np.asarray(samples) * 1000.0
+            stats = {f"p{p}": float(np.percentile(ms, p)) for p in percentiles}
+            stats["mean"] = float(ms.mean())
+            stats["count"] = count
+            summary[name] = stats
+        return summary
+
+    def report(self):
+        lines = [f"{'stage':<16}{'count':>8}{'mean':>10}{'p50':>10}{'p90':>10}{'p99':>10}"]
+        for name, stats in self.summary().items():
+            lines.append(f"{name:<16}{stats['count']:>8}{stats['mean']:>10.3f}"
+                         f"{stats['p50']:>10.3f}{stats['p90']:>10.3f}{stats['p99']:>10.3f}")
+        return "\n".join(lines)
+
+    def export_chrome_trace(self, filename):
+        """Write recorded spans in Chrome trace format (chrome://tracing, Perfetto)"""
+        if self.events is None:
+            raise ValueError("Profiler was created without trace=True")
+        with self._lock:
+            events = list(self.events)
+        pid = os.getpid()
+        thread_names = {t.ident: t.name for t in threading.enumerate()}
+        trace = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+             "args": {"name": thread_names.get(tid, str(tid))}}
+            for tid in {event[3] for event in events}
+        ]
+        trace.extend(
+            {"name": name, "cat": "stage", "ph": "X", "pid": pid, "tid": tid,
+             "ts": start * 1e6, "dur": (end - start) * 1e6}
+            for name, start, end, tid in events
+        )
+        with open(filename, "w") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+
+
+class FramePool:
+    """Recycles frame buffers so the steady-state frame path allocates nothing.
+
+    acquire() hands out a free buffer of the requested shape, allocating only
+    when none is available; release() returns it for reuse.
+    """
+    def __init__(self, dtype=np.uint8, max_free=8):
+        self.dtype = dtype
+        self.max_free = max_free
+        self.allocated = 0
+        self._free = []
+        self._lock = threading.Lock()
+
+    def acquire(self, shape):
+        with self._lock:
+            for i, buf in enumerate(self._free):
+                if buf.shape == shape:
+                    return self._free.pop(i)
+            self.allocated += 1
+        return np.empty(shape, dtype=self.dtype)
+
+    def release(self, buf):
+        if buf is None:
+            return
+        with self._lock:
+            if len(self._free) < self.max_free:
+                self._free.append(buf)
+
+
+class FramePath:
+    """Camera BGR frame -> mirrored RGB frame, using recycled buffers.
+
+    The RGB frame is converted once and shared: MediaPipe reads it, then the
+    palette and landmarks are drawn on it and it goes straight to the display.
+    Callers release() the returned buffer when done with it.
+    """
+    def __init__(self, pool=None):
+        self.pool = pool or FramePool()
+        self._scratch = None
+
+    def to_rgb(self, bgr_frame):
+        """Color-convert into a reused scratch buffer"""
+        if self._scratch is None or self._scratch.shape != bgr_frame.shape:
+            self._scratch = np.empty_like(bgr_frame)
+        return cv2.cvtColor(bgr_frame, cv2.COLOR_BGR2RGB, dst=self._scratch)
+
+    def mirror(self, rgb_frame):
+        """Flip horizontally into a pooled buffer for a more intuitive mirror view"""
+        out = self.pool.acquire(rgb_frame.shape)
+        return cv2.flip(rgb_frame, 1, dst=out)
+
+    def prepare(self, bgr_frame):
+        return self.mirror(self.to_rgb(bgr_frame))
+
+    def release(self, rgb_frame):
+        self.pool.release(rgb_frame)
+
+
+class AllocationMeter:
+    """Measures per-frame transient allocations and garbage collections.
+
+    Uses tracemalloc, which NumPy reports its buffers to, so it slows frames
+    down noticeably; only enable it for allocation runs.
+    """
+    def __init__(self):
+        self.samples = []
+        self._gc_start = None
+        self.gc_collections = None
+
+    def start(self):
+        tracemalloc.start()
+        self._gc_start = [gen["collections"] for gen in gc.get_stats()]
+
+    @contextmanager
+    def frame(self):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            self.samples.append(peak - current)
+
+    def stop(self):
+        tracemalloc.stop()
+        self.gc_collections = [gen["collections"] - start
+                               for gen, start in zip(gc.get_stats(), self._gc_start)]
+
+    def summary(self):
+        per_frame = np.asarray(self.samples or [0], dtype=np.float64)
+        frames = max(1, len(self.samples))
+        return {
+            "bytes_per_frame_mean": float(per_frame.mean()),
+            "bytes_per_frame_p99": float(np.percentile(per_frame, 99)),
+            "gc_collections": self.gc_collections,
+            "gc_collections_per_1000_frames": [1000.0 * c / frames for c in self.gc_collections or []],
+        }
+
+
+class FramePipeline:
+    """Capture and inference stages running on their own threads.
+
+    The capture thread reads into pooled buffers and feeds them into a
+    bounded queue, the inference worker runs process_frame on them and
+    publishes the results into a second queue that the Tk main loop drains
+    with poll(). on_result_drop is called with results the queue discards.
+    A frame whose processing raises is skipped; the error is kept for
+    take_error() and the worker carries on with the next frame.
+    """
+    def __init__(self, cap, process_frame, queue_depth=1, drop_policy="oldest", on_result_drop=None):
+        self.cap = cap
+        self.process_frame = process_frame
+        self.capture_pool = FramePool()
+        self.frames = LatestFrameQueue(queue_depth, drop_policy, on_drop=self.capture_pool.release)
+        self.results = LatestFrameQueue(queue_depth, drop_policy, on_drop=on_result_drop)
+        self.capture_rate = RateCounter()
+        self.inference_rate = RateCounter()
+        self.errors = 0
+        self.error = None
+        self.running = False
+        self._threads = []
+
+    def start(self):
+        self.running = True
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="inference", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self.running = False
+        self.frames.close()
+        self.results.close()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        self._threads = []
+
+    def poll(self):
+        """Return the next processed result or None (called from the Tk thread)"""
+        return self.results.get_nowait()
+
+    def take_error(self):
+        """Return the last processing error since the previous call, or None"""
+        error, self.error = self.error, None
+        return error
+
+    def stats(self):
+        return {
+            "capture_fps": self.capture_rate.rate(),
+            "inference_fps": self.inference_rate.rate(),
+            "dropped_frames": self.frames.dropped,
+            "dropped_results": self.results.dropped,
+        }
+
+    def _capture_loop(self):
+        shape = None
+        while self.running:
+            buf = self.capture_pool.acquire(shape) if shape else None
+            ret, frame = self.cap.read(buf)
+            if not ret:
+                self.capture_pool.release(buf)
+                # Camera hiccup, try again shortly instead of spinning
+                time.sleep(0.01)
+                continue
+            if frame is not buf:
+                # First frame, or the camera changed resolution
+                self.capture_pool.release(buf)
+                shape = frame.shape
+            self.capture_rate.tick()
+            self.frames.put(frame)
+
+    def _inference_loop(self):
+        while self.running:
+            frame = self.frames.get(timeout=0.1)
+            if frame is None:
+                continue
+            try:
+                result = self.process_frame(frame)
+            except Exception as e:  # one bad frame must not stop the preview and drawing
+                self.errors += 1
+                self.error = e
+                continue
+            finally:
+                self.capture_pool.release(frame)
+            self.inference_rate.tick()
+            self.results.put(result)
+
+
+def create_hands(max_hands=1):
+    """A MediaPipe Hands model with the detection settings every part of the app uses"""
+    return load_mediapipe().solutions.hands.Hands(
+        max_num_hands=max_hands,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+
+class HandsCache:
+    """Initialized MediaPipe Hands instances kept for reuse (the warm model).
+
+    Building Hands loads the palm detection and landmark models, a large
+    part of startup. With warm=True, release() keeps the instance for the
+    next acquire() with the same settings instead of closing it.
+    """
+    def __init__(self, warm=True):
+        self.warm = warm
+        self._idle = {}  # max_hands -> Hands
+        self._lock = threading.Lock()
+
+    def acquire(self, max_hands=1):
+        with self._lock:
+            hands = self._idle.pop(max_hands, None)
+        if hands is None:
+            hands = create_hands(max_hands)
+        return hands
+
+    def release(self, hands, max_hands=1):
+        if self.warm:
+            with self._lock:
+                if max_hands not in self._idle:
+                    self._idle[max_hands] = hands
+                    return
+        hands.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for hands in idle.values():
+            hands.close()
+
+
+class StartupLoader:
+    """Runs the slow parts of app startup on a background thread.
+
+    The stages import OpenCV and MediaPipe, build the hand model (or take a
+    warm one from hands_cache) and open the camera, unless camera is None.
+    The Tk thread polls stage to show progress and picks up hands and cap
+    once done is set. run() does the same work inline, for benchmarks.
+    """
+    def __init__(self, hands_cache, max_hands=1, camera=0):
+        self.hands_cache = hands_cache
+        self.max_hands = max_hands
+        self.camera = camera
+        self.stage = "Starting"
+        self.times = {}  # stage -> seconds
+        self.hands = None
+        self.cap = None
+        self.error = None
+        self.cancelled = False
+        self.done = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self.run, name="startup", daemon=True).start()
+        return self
+
+    def run(self):
+        stages = [("Loading OpenCV", load_opencv),
+                  ("Loading MediaPipe", load_mediapipe),
+                  ("Loading hand model", self._load_hands)]
+        if self.camera is not None:
+            stages.append(("Opening camera", self._open_camera))
+        try:
+            for stage, step in stages:
+                if self.cancelled:
+                    break
+                self.stage = stage
+                start = time.perf_counter()
+                step()
+                self.times[stage] = time.perf_counter() - start
+        except Exception as e:  # shown in the status bar instead of killing the thread silently
+            self.error = e
+        finally:
+            if self.cancelled:
+                self.release()
+            self.done.set()
+        return self
+
+    def release(self):
+        """Give back what was loaded, when nobody is going to use it"""
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+        if self.hands is not None:
+            self.hands_cache.release(self.hands, self.max_hands)
+            self.hands = None
+
+    def _load_hands(self):
+        self.hands = self.hands_cache.acquire(self.max_hands)
+
+    def _open_camera(self):
+        self.cap = cv2.VideoCapture(self.camera)
+        if not self.cap.isOpened():
+            raise OSError(f"Cannot open camera {self.camera}")
+
+
+class RasterCanvas:
+    """Offscreen RGB backing store that committed strokes are rasterized into.
+
+    The buffer only grows with the largest canvas size seen and is capped at
+    MAX_SIZE, so memory stays bounded no matter how long a session runs.
+    """
+    MAX_SIZE = (4096, 4096)
+
+    def __init__(self, width, height, background="white"):
+        self.background = background
+        self.image = None
+        self.draw = None
+        self.dirty = True
+        self.resize(width, height)
+
+    @property
+    def size(self):
+        return self.image.size
+
+    def resize(self, width, height):
+        """Grow the buffer to at least width x height, keeping existing pixels"""
+        width = max(1, min(int(width), self.MAX_SIZE[0]))
+        height = max(1, min(int(height), self.MAX_SIZE[1]))
+        if self.image is not None:
+            if width <= self.image.width and height <= self.image.height:
+                return False
+            width = max(width, self.image.width)
+            height = max(height, self.image.height)
+        image = Image.new("RGB", (width, height), self.background)
+        if self.image is not None:
+            image.paste(self.image, (0, 0))
+        self.image = image
+        self.draw = ImageDraw.Draw(self.image)
+        self.dirty = True
+        return True
+
+    def clear(self):
+        self.draw.rectangle((0, 0, self.image.width, self.image.height), fill=self.background)
+        self.dirty = True
+
+    def line(self, x0, y0, x1, y1, color, width):
+        """Draw a line segment with round caps, like Tk's capstyle=ROUND"""
+        fill = COLOR_HEX.get(color, color)
+        self.draw.line((x0, y0, x1, y1), fill=fill, width=width)
+        if width > 2:
+            r = width / 2
+            self.draw.ellipse((x0 - r, y0 - r, x0 + r, y0 + r), fill=fill)
+            self.draw.ellipse((x1 - r, y1 - r, x1 + r, y1 + r), fill=fill)
+        self.dirty = True
+
+    def polyline(self, points, color, width):
+        """Draw a connected stroke through a list of (x, y) points in one call"""
+        fill = COLOR_HEX.get(color, color)
+        if len(points) > 1:
+            self.draw.line([tuple(p) for p in points], fill=fill, width=width, joint="curve")
+        if width > 2:
+            r = width / 2
+            for x, y in (points[0], points[-1]):
+                self.draw.ellipse((x - r, y - r, x + r, y + r), fill=fill)
+        self.dirty = True
+
+    def rectangle(self, x0, y0, x1, y1, color, width):
+        box = (min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+        self.draw.rectangle(box, outline=COLOR_HEX.get(color, color), width=width)
+        self.dirty = True
+
+    def circle(self, cx, cy, radius, color, width):
+        # Integer box, so TiledCanvas draws exactly the same ellipse
+        box = (round(cx - radius), round(cy - radius), round(cx + radius), round(cy + radius))
+        self.draw.ellipse(box, outline=COLOR_HEX.get(color, color), width=width)
+        self.dirty = True
+
+    def to_array(self):
+        """Return the drawing as an (h, w, 3) uint8 NumPy array"""
+        return np.asarray(self.image)
+
+    def save_png(self, filename, size=None):
+        """Write the buffer (optionally cropped to size) straight to a PNG file"""
+        image = self.image
+        if size is not None:
+            image = image.crop((0, 0, min(size[0], image.width), min(size[1], image.height)))
+        image.save(filename, "PNG")
+
+
+class CanvasTransform:
+    """Uniform scale plus offset between two pixel spaces: out = point * scale + offset"""
+    def __init__(self, scale=1.0, offset_x=0.0, offset_y=0.0):
+        self.scale = scale
+        self.offset_x = offset_x
+        self.offset_y = offset_y
+
+    def apply(self, x, y):
+        return x * self.scale + self.offset_x, y * self.scale + self.offset_y
+
+    def apply_int(self, x, y):
+        return int(round(x * self.scale + self.offset_x)), int(round(y * self.scale + self.offset_y))
+
+    def inverse(self):
+        return CanvasTransform(1.0 / self.scale, -self.offset_x / self.scale, -self.offset_y / self.scale)
+
+
+class TiledCanvas:
+    """Drawing store split into square tiles that are only allocated once painted.
+
+    Memory grows with the area actually drawn on, not with the canvas size,
+    so poster-sized canvases are cheap. Every drawing call records the
+    tiles it touched in dirty_tiles, so viewers re-upload only those (see
+    take_dirty). Drawing calls match RasterCanvas.
+    """
+    def __init__(self, width, height, tile_size=256, background="white"):
+        self.width = int(width)
+        self.height = int(height)
+        self.tile_size = tile_size
+        self.background = background
+        self.tiles = {}  # (tx, ty) -> PIL image
+        self._draws = {}
+        self.dirty_tiles = set()
+        self.painted = None  # (right, bottom) of everything drawn so far
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    @property
+    def grid(self):
+        """Number of tile columns and rows"""
+        ts = self.tile_size
+        return -(-self.width // ts), -(-self.height // ts)
+
+    @property
+    def memory_bytes(self):
+        return len(self.tiles) * self.tile_size * self.tile_size * 3
+
+    @property
+    def dirty(self):
+        return bool(self.dirty_tiles)
+
+    def take_dirty(self):
+        """Return the tiles changed since the last call and reset the set"""
+        dirty, self.dirty_tiles = self.dirty_tiles, set()
+        return dirty
+
+    def resize(self, width, height):
+        """Grow the canvas to at least width x height; no memory is allocated"""
+        width, height = max(self.width, int(width)), max(self.height, int(height))
+        grew = (width, height) != (self.width, self.height)
+        self.width, self.height = width, height
+        return grew
+
+    def clear(self):
+        # Dropped tiles are dirty too, viewers show them as background again
+        self.dirty_tiles.update(self.tiles)
+        self.tiles = {}
+        self._draws = {}
+        self.painted = None
+
+    def _tile_draw(self, key):
+        draw = self._draws.get(key)
+        if draw is None:
+            ts = self.tile_size
+            self.tiles[key] = Image.new("RGB", (ts, ts), self.background)
+            draw = self._draws[key] = ImageDraw.Draw(self.tiles[key])
+        return draw
+
+    def tile_range(self, x0, y0, x1, y1):
+        """First and last tile column and row covering a pixel box, clamped to the grid"""
+        ts = self.tile_size
+        cols, rows = self.grid
+        return (max(int(x0 // ts), 0), max(int(y0 // ts), 0),
+                min(int(x1 // ts), cols - 1), min(int(y1 // ts), rows - 1))
+
+    def _near_path(self, points, reach):
+        """Keys of tiles within reach of any segment of a list of (x, y) points"""
+        ts = self.tile_size
+        # A tile is touched if the path passes within reach of its square,
+        # i.e. within reach + half a diagonal of its center
+        slack = reach + ts * 0.7072
+        segments = zip(points[:-1], points[1:]) if len(points) > 1 else [(points[0], points[0])]
+        keys = set()
+        for (ax, ay), (bx, by) in segments:
+            tx0, ty0, tx1, ty1 = self.tile_range(min(ax, bx) - reach, min(ay, by) - reach,
+                                                 max(ax, bx) + reach, max(ay, by) + reach)
+            if tx1 < tx0 or ty1 < ty0:
+                continue
+            if (tx1 - tx0 + 1) * (ty1 - ty0 + 1) <= 4:
+                keys.update((tx, ty) for tx in range(tx0, tx1 + 1) for ty in range(ty0, ty1 + 1))
+                continue
+            # Long segment: keep the tiles of its bounding box that it actually passes
+            tx, ty = np.meshgrid(np.arange(tx0, tx1 + 1), np.arange(ty0, ty1 + 1))
+            cx, cy = (tx + 0.5) * ts - ax, (ty + 0.5) * ts - ay
+            dx, dy = bx - ax, by - ay
+            t = np.clip((cx * dx + cy * dy) / max(dx * dx + dy * dy, 1e-9), 0.0, 1.0)
+            near = np.hypot(cx - t * dx, cy - t * dy) <= slack
+            keys.update(zip(tx[near].tolist(), ty[near].tolist()))
+        return keys
+
+    def _near_ring(self, cx, cy, radius, reach):
+        """Keys of tiles crossed by a circle outline"""
+        ts = self.tile_size
+        tx0, ty0, tx1, ty1 = self.tile_range(cx - radius - reach, cy - radius - reach,
+                                             cx + radius + reach, cy + radius + reach)
+        if tx1 < tx0 or ty1 < ty0:
+            return set()
+        tx, ty = np.meshgrid(np.arange(tx0, tx1 + 1), np.arange(ty0, ty1 + 1))
+        # Nearest and farthest point of each tile from the center
+        x0, y0 = tx * ts - cx, ty * ts - cy
+        x1, y1 = x0 + ts, y0 + ts
+        near = np.hypot(np.maximum(0, np.maximum(x0, -x1)), np.maximum(0, np.maximum(y0, -y1)))
+        far = np.hypot(np.maximum(np.abs(x0), np.abs(x1)), np.maximum(np.abs(y0), np.abs(y1)))
+        crossed = (near <= radius + reach) & (far >= radius - reach)
+        return set(zip(tx[crossed].tolist(), ty[crossed].tolist()))
+
+    def _paint(self, keys, paint, right, bottom):
+        """Call paint(draw, dx, dy) for every tile in keys, with dx, dy the tile origin.
+
+        right and bottom bound the pixels the drawing call can touch.
+        """
+        ts = self.tile_size
+        for key in keys:
+            paint(self._tile_draw(key), key[0] * ts, key[1] * ts)
+        self.dirty_tiles.update(keys)
+        if keys:
+            old_right, old_bottom = self.painted or (0, 0)
+            self.painted = (max(old_right, min(self.width, int(np.ceil(right)))),
+                            max(old_bottom, min(self.height, int(np.ceil(bottom)))))
+
+    def line(self, x0, y0, x1, y1, color, width):
+        """Draw a line segment with round caps, like Tk's capstyle=ROUND"""
+        self.polyline([(x0, y0), (x1, y1)], color, width)
+
+    def polyline(self, points, color, width):
+        """Draw a connected stroke through a list of (x, y) points"""
+        if not len(points):
+            return
+        fill = COLOR_HEX.get(color, color)
+        r = width / 2
+        points = [tuple(p) for p in points]
+        
+        def paint(draw, dx, dy):
+            shifted = [(x - dx, y - dy) for x, y in points]
+            if len(shifted) > 1:
+                draw.line(shifted, fill=fill, width=width, joint="curve")
+            if width > 2:
+                for x, y in (shifted[0], shifted[-1]):
+                    draw.ellipse((x - r, y - r, x + r, y + r), fill=fill)
+        
+        self._paint(self._near_path(points, r + 1), paint,
+                    max(x for x, _ in points) + r + 1, max(y for _, y in points) + r + 1)
+
+    def rectangle(self, x0, y0, x1, y1, color, width):
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        outline = COLOR_HEX.get(color, color)
+        
+        def paint(draw, dx, dy):
+            draw.rectangle((x0 - dx, y0 - dy, x1 - dx, y1 - dy), outline=outline, width=width)
+        
+        # PIL draws the outline inside the box, so only the edges touch tiles
+        edges = [(x0, y0), (x1, y0), (x1, y1), (x0, y1), (x0, y0)]
+        # A box narrower than the outline spills past x1/y1
+        self._paint(self._near_path(edges, width + 1), paint, x1 + width + 1, y1 + width + 1)
+
+    def circle(self, cx, cy, radius, color, width):
+        outline = COLOR_HEX.get(color, color)
+        # Round once: a fractional box shifted per tile would round differently on each side of a seam
+        x0, y0 = round(cx - radius), round(cy - radius)
+        x1, y1 = round(cx + radius), round(cy + radius)
+        
+        def paint(draw, dx, dy):
+            draw.ellipse((x0 - dx, y0 - dy, x1 - dx, y1 - dy), outline=outline, width=width)
+        
+        self._paint(self._near_ring(cx, cy, radius, width + 1), paint, x1 + width + 1, y1 + width + 1)
+
+    def extent(self):
+        """Size of the smallest top-left aligned area holding everything drawn, None if empty"""
+        if self.painted is None:
+            return None
+        return max(1, self.painted[0]), max(1, self.painted[1])
+
+    def compose(self, size=None):
+        """Assemble the top-left size (default: the drawn extent) into one PIL image"""
+        width, height = size or self.extent() or (1, 1)
+        image = Image.new("RGB", (width, height), self.background)
+        ts = self.tile_size
+        for (tx, ty), tile in self.tiles.items():
+            if tx * ts < width and ty * ts < height:
+                image.paste(tile, (tx * ts, ty * ts))
+        return image
+
+    def to_array(self, size=None):
+        """Return the drawing as an (h, w, 3) uint8 NumPy array"""
+        return np.asarray(self.compose(size))
+
+    def save_png(self, filename, size=None):
+        """Write the painted area (or the top-left size) to a PNG file"""
+        self.compose(size).save(filename, "PNG")
+
+
+# MediaPipe hand landmark indices (mp.solutions.hands.HandLandmark)
+WRIST = 0
+THUMB_MCP = 2
+THUMB_IP = 3
+THUMB_TIP = 4
+INDEX_FINGER_MCP = 5
+INDEX_FINGER_DIP = 7
+INDEX_FINGER_TIP = 8
+MIDDLE_FINGER_MCP = 9
+MIDDLE_FINGER_TIP = 12
+RING_FINGER_MCP = 13
+RING_FINGER_TIP = 16
+PINKY_MCP = 17
+PINKY_TIP = 20
+
+SHAPE_MODES = ("line", "rectangle", "circle")
+
+
+class PaletteOverlay:
+    """Color palette composited onto the top-right corner of the video feed.
+
+    The composited pixels, their mask and a pixel -> color lookup table only
+    depend on the palette and the frame size, so they are built once per
+    frame size and every frame just does one masked copy into its ROI.
+    """
+    LAYOUTS = ("vertical", "horizontal", "grid")
+
+    def __init__(self, colors, layout="vertical", thickness=50, length=480, margin=10,
+                 label="Colors", columns=3):
+        if layout not in self.LAYOUTS:
+            raise ValueError(f"Unknown palette layout: {layout}")
+        self.colors = list(colors)
+        self.color_names = [name for name, _ in self.colors]
+        self.layout = layout
+        self.thickness = thickness
+        self.length = length
+        self.margin = margin
+        self.label = label
+        self.columns = columns
+        self._cache = None
+
+    def grid_shape(self):
+        """Rows and columns of color cells for the configured layout"""
+        n = len(self.colors)
+        if self.layout == "vertical":
+            return n, 1
+        if self.layout == "horizontal":
+            return 1, n
+        cols = max(1, min(self.columns, n))
+        return -(-n // cols), cols
+
+    def palette_size(self):
+        """Unclipped (width, height) of the palette for the configured layout"""
+        if self.layout == "vertical":
+            return self.thickness, self.length
+        if self.layout == "horizontal":
+            return self.length, self.thickness
+        rows, cols = self.grid_shape()
+        cell = max(self.thickness, self.length // len(self.colors))
+        return cols * cell, rows * cell
+
+    def _build(self, frame_w, frame_h):
+        """Pre-render the palette, label, mask and lookup table for a frame size"""
+        m = self.margin
+        width, height = self.palette_size()
+        # Shrink to fit small frames rather than letting the palette fall off the edge
+        pal_w = max(1, min(width, frame_w - 2 * m))
+        pal_h = max(1, min(height, frame_h - 2 * m))
+        x0, y0 = frame_w - pal_w - m, m
+        
+        # The ROI runs to the right edge of the frame so the label can overhang the palette
+        roi_w = frame_w - x0
+        image = np.full((pal_h, roi_w, 3), 255, dtype=np.uint8)
+        mask = np.zeros((pal_h, roi_w), dtype=bool)
+        mask[:, :pal_w] = True
+        lut = np.full((pal_h, roi_w), -1, dtype=np.int16)
+        
+        rows, cols = self.grid_shape()
+        cell_h, cell_w = pal_h // rows, pal_w // cols
+        for i, (name, hex_color) in enumerate(self.colors):
+            # Frames are RGB from the camera conversion onwards
+            r = int(hex_color[1:3], 16)
+            g = int(hex_color[3:5], 16)
+            b = int(hex_color[5:7], 16)
+            
+            row, col = divmod(i, cols)
+            ys = slice(row * cell_h, (row + 1) * cell_h)
+            xs = slice(col * cell_w, (col + 1) * cell_w)
+            image[ys, xs] = (r, g, b)
+            lut[ys, xs] = i
+        
+        # Add text label to show what the strip is
+        if self.label:
+            text_mask = np.zeros((pal_h, roi_w), dtype=np.uint8)
+            cv2.putText(text_mask, self.label, (5, 15), cv2.FONT_HERSHEY_SIMPLEX, 0.5, 255, 2)
+            text_px = text_mask > 0
+            image[text_px] = 0
+            mask |= text_px
+        
+        return (frame_w, frame_h), x0, y0, image, mask[..., None], lut
+
+    def _layout_for(self, frame_w, frame_h):
+        cache = self._cache
+        if cache is None or cache[0] != (frame_w, frame_h):
+            # Built into a local and swapped in whole, so the inference and
+            # Tk threads never see a half-built cache
+            cache = self._cache = self._build(frame_w, frame_h)
+        return cache
+
+    def apply(self, frame):
+        """Composite the palette onto an RGB frame in place"""
+        frame_h, frame_w = frame.shape[:2]
+        _, x0, y0, image, mask, _ = self._layout_for(frame_w, frame_h)
+        roi = frame[y0:y0 + image.shape[0], x0:x0 + image.shape[1]]
+        np.copyto(roi, image, where=mask)
+
+    def indices_at(self, xs, ys, frame_w, frame_h):
+        """Vectorized lookup: color index under each (x, y), -1 outside the palette"""
+        _, x0, y0, _, _, lut = self._layout_for(frame_w, frame_h)
+        xs = np.asarray(xs, dtype=np.intp) - x0
+        ys = np.asarray(ys, dtype=np.intp) - y0
+        inside = (xs >= 0) & (xs < lut.shape[1]) & (ys >= 0) & (ys < lut.shape[0])
+        indices = np.full(xs.shape, -1, dtype=np.int16)
+        indices[inside] = lut[ys[inside], xs[inside]]
+        return indices
+
+    def color_at(self, x, y, frame_w, frame_h):
+        """Color name under pixel (x, y) of a frame_w x frame_h frame, or None"""
+        _, x0, y0, _, _, lut = self._layout_for(frame_w, frame_h)
+        x, y = int(x) - x0, int(y) - y0
+        if 0 <= y < lut.shape[0] and 0 <= x < lut.shape[1]:
+            index = lut[y, x]
+            if index >= 0:
+                return self.color_names[index]
+        return None
+
+
+class AdaptiveHandTracker:
+    """Shrinks the image MediaPipe has to look at before hands.process.
+
+    Frames are downscaled so their long side is at most inference_size.
+    With use_roi, while a hand is tracked only a padded box around the
+    previous landmarks is processed, falling back to full-frame detection when
+    the hand is lost (and every full_frame_interval frames so new hands can be
+    found). Off by default: the crops change size from frame to frame, which
+    MediaPipe's video-mode tracker has not been benchmarked against.
+    Landmarks are mapped back to full-frame normalized coordinates in place,
+    so callers get the same results object as from hands.process(frame).
+    """
+    def __init__(self, hands, inference_size=320, use_roi=False, roi_padding=0.3,
+                 min_roi_size=96, full_frame_interval=30):
+        self.hands = hands
+        self.inference_size = inference_size
+        self.use_roi = use_roi
+        self.roi_padding = roi_padding
+        self.min_roi_size = min_roi_size
+        self.full_frame_interval = full_frame_interval
+        self.roi = None  # (x0, y0, x1, y1) in full-frame pixels
+        self.frames_since_full = 0
+        self.roi_frames = 0
+        self.full_frames = 0
+
+    def reset(self):
+        self.roi = None
+        self.frames_since_full = 0
+
+    def process(self, rgb_frame):
+        """Run hand tracking on an RGB frame, returning full-frame landmarks"""
+        frame_h, frame_w = rgb_frame.shape[:2]
+        roi = self.roi
+        if not self.use_roi or self.frames_since_full >= self.full_frame_interval:
+            roi = None
+        
+        if roi is not None:
+            results = self._process_region(rgb_frame, roi)
+            if results.multi_hand_landmarks:
+                self.roi_frames += 1
+                self.frames_since_full += 1
+                self._update_roi(results, frame_w, frame_h)
+                return results
+        
+        # Tracking lost (or not established yet), search the whole frame
+        results = self._process_region(rgb_frame, (0, 0, frame_w, frame_h))
+        self.full_frames += 1
+        self.frames_since_full = 0
+        if results.multi_hand_landmarks:
+            self._update_roi(results, frame_w, frame_h)
+        else:
+            self.roi = None
+        return results
+
+    def _process_region(self, rgb_frame, region):
+        frame_h, frame_w = rgb_frame.shape[:2]
+        x0, y0, x1, y1 = region
+        crop = rgb_frame[y0:y1, x0:x1]
+        crop_w, crop_h = x1 - x0, y1 - y0
+        
+        scale = self.inference_size / max(crop_w, crop_h) if self.inference_size else 1.0
+        if scale < 1.0:
+            crop = cv2.resize(crop, (max(1, int(crop_w * scale)), max(1, int(crop_h * scale))),
+                              interpolation=cv2.INTER_AREA)
+        elif (crop_w, crop_h) != (frame_w, frame_h):
+            # MediaPipe wants a contiguous buffer, a bare slice is a strided view
+            crop = np.ascontiguousarray(crop)
+        
+        results = self.hands.process(crop)
+        
+        # Map crop-normalized landmarks back to full-frame normalized coordinates
+        if results.multi_hand_landmarks and (crop_w, crop_h) != (frame_w, frame_h):
+            sx, sy = crop_w / frame_w, crop_h / frame_h
+            ox, oy = x0 / frame_w, y0 / frame_h
+            for hand_landmarks in results.multi_hand_landmarks:
+                for landmark in hand_landmarks.landmark:
+                    landmark.x = ox + landmark.x * sx
+                    landmark.y = oy + landmark.y * sy
+        return results
+
+    def _update_roi(self, results, frame_w, frame_h):
+        """Pick the crop for the next frame from the current landmarks"""
+        xs = [lm.x for hand in results.multi_hand_landmarks for lm in hand.landmark]
+        ys = [lm.y for hand in results.multi_hand_landmarks for lm in hand.landmark]
+        bx0, bx1 = min(xs) * frame_w, max(xs) * frame_w
+        by0, by1 = min(ys) * frame_h, max(ys) * frame_h
+        
+        # Keep the current crop while the hand stays well inside it, so
+        # MediaPipe's own tracker sees a steady image
+        if self.roi is not None:
+            x0, y0, x1, y1 = self.roi
+            inset = 0.1 * max(x1 - x0, y1 - y0)
+            hand_size = max(bx1 - bx0, by1 - by0)
+            if (x0 + inset <= bx0 and bx1 <= x1 - inset and y0 + inset <= by0 and by1 <= y1 - inset
+                    and hand_size > 0.3 * max(x1 - x0, y1 - y0)):
+                return
+        
+        # Square box around the hand, padded on every side
+        side = max(bx1 - bx0, by1 - by0) * (1 + 2 * self.roi_padding)
+        side = max(side, self.min_roi_size)
+        cx, cy = (bx0 + bx1) / 2, (by0 + by1) / 2
+        x0 = int(max(0, cx - side / 2))
+        y0 = int(max(0, cy - side / 2))
+        x1 = int(min(frame_w, cx + side / 2))
+        y1 = int(min(frame_h, cy + side / 2))
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            self.roi = None
+        else:
+            self.roi = (x0, y0, x1, y1)
+
+
+def results_to_array(results):
+    """Stack the landmarks of all detected hands into an (n, 21, 3) float32 array"""
+    points = getattr(results, "points", None)
+    if points is not None:
+        return np.asarray(points, dtype=np.float32) if len(points) else None
+    if not results.multi_hand_landmarks:
+        return None
+    return np.array([[(lm.x, lm.y, lm.z) for lm in hand.landmark]
+                     for hand in results.multi_hand_landmarks], dtype=np.float32)
+
+
+def handedness_labels(handedness, count):
+    """Handedness label ("Left"/"Right") of each hand, empty where unknown"""
+    if not handedness:
+        return [""] * count
+    # Landmark recordings store the labels themselves
+    return [h if isinstance(h, str) else h.classification[0].label if h.classification else ""
+            for h in handedness][:count]
+
+
+def match_hands(previous, current, max_distance=np.inf, labels=None, previous_labels=None,
+                label_penalty=0.0):
+    """Pair current wrist positions with previous ones, closest pairs first.
+
+    Returns the index of the matching previous hand for every current hand,
+    or -1 when none is within max_distance. Pairs whose handedness labels
+    are known and differ rank as label_penalty further apart, but can still
+    match: MediaPipe sometimes flips the label of a single hand.
+    """
+    matches = np.full(len(current), -1)
+    if not len(current) or not len(previous):
+        return matches
+    dist = np.linalg.norm(np.asarray(current, dtype=np.float32)[:, None]
+                          - np.asarray(previous, dtype=np.float32)[None], axis=-1)
+    cost = dist.copy()
+    if labels is not None and previous_labels is not None:
+        cur = np.array(labels, dtype=str)[:, None]
+        prev = np.array(previous_labels, dtype=str)[None]
+        cost[(cur != prev) & (cur != "") & (prev != "")] += label_penalty
+    cost[dist > max_distance] = np.inf
+    
+    used = np.zeros(len(previous), dtype=bool)
+    for flat in np.argsort(cost, axis=None):
+        i, j = divmod(int(flat), len(previous))
+        if not np.isfinite(cost[i, j]):
+            break
+        if matches[i] < 0 and not used[j]:
+            matches[i] = j
+            used[j] = True
+    return matches
+
+
+class LandmarkResults:
+    """Stand-in for a MediaPipe results object built from landmark arrays"""
+    def __init__(self, points, handedness=None):
+        self.points = points
+        self.multi_handedness = handedness
+        self._landmarks = None
+
+    @property
+    def multi_hand_landmarks(self):
+        """MediaPipe landmark lists, built on first use (only landmark drawing needs them)"""
+        if self._landmarks is None and self.points is not None and len(self.points):
+            self._landmarks = []
+            for hand in self.points:
+                landmark_list = landmark_pb2.NormalizedLandmarkList()
+                for x, y, z in hand:
+                    landmark_list.landmark.add(x=float(x), y=float(y), z=float(z))
+                self._landmarks.append(landmark_list)
+        return self._landmarks
+
+
+class RecordedTracker:
+    """Tracker for landmark recordings: the frame passed to process() already is the results"""
+    def process(self, results):
+        return results
+
+
+class OneEuroFilter:
+    """One-Euro low-pass filter applied element-wise to landmark arrays.
+
+    Slow movements get heavily smoothed, fast ones follow closely; see
+    Casiez et al., "1 Euro Filter" (CHI 2012). The filtered derivative is
+    kept in dx for extrapolation.
+    """
+    def __init__(self, min_cutoff=1.5, beta=0.5, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self.x = None
+        self.dx = None
+        self.t = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2 * np.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def __call__(self, x, t):
+        if self.x is None or x.shape != self.x.shape:
+            self.x = x.astype(np.float32)
+            self.dx = np.zeros_like(self.x)
+            self.t = t
+            return self.x
+        dt = max(t - self.t, 1e-6)
+        a_d = self._alpha(self.d_cutoff, dt)
+        self.dx = a_d * (x - self.x) / dt + (1 - a_d) * self.dx
+        a = self._alpha(self.min_cutoff + self.beta * np.abs(self.dx), dt)
+        self.x = a * x + (1 - a) * self.x
+        self.t = t
+        return self.x
+
+
+class LandmarkPredictor:
+    """Constant-velocity motion model for hand landmarks between inference runs.
+
+    Only the index fingertip, which positions the pen, is smoothed and
+    extrapolated; the rest of each hand keeps its last measured shape,
+    moved along with the tip. Extrapolating every landmark overshoots the
+    thumb and flips the pen gesture on predicted frames.
+    """
+    def __init__(self, max_extrapolation=0.2, **filter_args):
+        self.max_extrapolation = max_extrapolation
+        self.filter = OneEuroFilter(**filter_args)
+        self.points = None  # last measured landmarks, in filter row order
+        self.handedness = None
+
+    def observe(self, points, t, handedness=None):
+        """Feed landmarks from an inference run, or None when no hand was found"""
+        if points is None:
+            self.filter.reset()
+            self.points = None
+            self.handedness = None
+            return
+        previous = self.points
+        if previous is not None and previous.shape == points.shape and len(points) > 1:
+            # MediaPipe doesn't keep hands in a fixed order, keep each one on its own filter row
+            matches = match_hands(previous[:, WRIST, :2], points[:, WRIST, :2])
+            order = np.argsort(matches)
+            points = points[order]
+            if handedness:
+                handedness = [handedness[i] for i in order]
+        self.filter(points[:, INDEX_FINGER_TIP], t)
+        self.points = points
+        self.handedness = handedness
+
+    def predict(self, t):
+        """Predicted landmarks at time t, or None if no hand is tracked"""
+        if self.points is None:
+            return None
+        # Don't run off with a stale velocity if inference stalls
+        dt = min(max(t - self.filter.t, 0.0), self.max_extrapolation)
+        tip = self.filter.x + self.filter.dx * dt
+        return self.points + (tip - self.points[:, INDEX_FINGER_TIP])[:, None]
+
+
+class FrameSkippingTracker:
+    """Runs hand tracking on a subset of frames and predicts the others.
+
+    skip=N runs inference on every Nth frame, skip=0 picks N from the
+    measured inference latency and frame interval. With asynchronous=True
+    inference runs on its own thread, so frames keep flowing at camera rate
+    while MediaPipe works; replays use the synchronous mode so results are
+    reproducible. An error on the inference thread is raised from the next
+    process() call, and the thread keeps serving later frames.
+    """
+    def __init__(self, tracker, skip=0, asynchronous=True, predictor=None, max_skip=8):
+        self.tracker = tracker
+        self.skip = skip
+        self.max_skip = max_skip
+        self.asynchronous = asynchronous
+        self.predictor = predictor or LandmarkPredictor()
+        self.inference_rate = RateCounter()
+        self.latency = None
+        self.frame_interval = None
+        self.frame_index = 0
+        self.last_inferred = None
+        self.last_frame_t = None
+        self.errors = 0
+        self._error = None
+        self._lock = threading.Lock()
+        self._busy = False
+        self._pool = FramePool()
+        self._jobs = None
+        self._thread = None
+
+    def interval(self):
+        """Number of frames between inference runs"""
+        if self.skip:
+            return self.skip
+        if not self.latency or not self.frame_interval:
+            return 1
+        return int(min(self.max_skip, max(1, np.ceil(self.latency / self.frame_interval))))
+
+    def process(self, rgb_frame, t=None):
+        """Return results for this frame, measured or predicted"""
+        with self._lock:
+            error, self._error = self._error, None
+        if error is not None:
+            # Surface it on the caller's thread, e.g. in FramePipeline's error report
+            raise error
+        t = time.perf_counter() if t is None else t
+        if self.last_frame_t is not None and t > self.last_frame_t:
+            self.frame_interval = self._ema(self.frame_interval, t - self.last_frame_t)
+        self.last_frame_t = t
+        
+        due = self.last_inferred is None or self.frame_index - self.last_inferred >= self.interval()
+        if due:
+            if not self.asynchronous:
+                self._infer(rgb_frame, t)
+                self.last_inferred = self.frame_index
+            elif self._claim():
+                # The caller reuses its buffer, so hand the worker a pooled copy
+                job_frame = self._pool.acquire(rgb_frame.shape)
+                np.copyto(job_frame, rgb_frame)
+                self._submit(job_frame, t)
+                self.last_inferred = self.frame_index
+        self.frame_index += 1
+        
+        with self._lock:
+            return LandmarkResults(self.predictor.predict(t), self.predictor.handedness)
+
+    def close(self):
+        """Stop the inference thread; returns once it is out of tracker.process()"""
+        if self._jobs is not None:
+            self._jobs.close()
+            # The caller closes the model next, so the worker must be done with it
+            self._thread.join()
+            self._jobs = self._thread = None
+
+    def _claim(self):
+        """Mark the worker busy, returns False if it already was"""
+        with self._lock:
+            if self._busy:
+                return False
+            self._busy = True
+            return True
+
+    def _ema(self, value, sample, weight=0.1):
+        return sample if value is None else value + weight * (sample - value)
+
+    def _infer(self, rgb_frame, t):
+        start = time.perf_counter()
+        results = self.tracker.process(rgb_frame)
+        self.latency = self._ema(self.latency, time.perf_counter() - start)
+        self.inference_rate.tick()
+        with self._lock:
+            self.predictor.observe(results_to_array(results), t, results.multi_handedness)
+
+    def _submit(self, rgb_frame, t):
+        if self._thread is None:
+            self._jobs = LatestFrameQueue(1, "oldest")
+            self._thread = threading.Thread(target=self._worker, name="skip-inference", daemon=True)
+            self._thread.start()
+        self._jobs.put((rgb_frame, t))
+
+    def _worker(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            try:
+                self._infer(*job)
+            except Exception as e:  # keep the worker alive, process() reports it
+                with self._lock:
+                    self.errors += 1
+                    self._error = e
+            finally:
+                self._pool.release(job[0])
+                with self._lock:
+                    self._busy = False
+
+
+class HandFeatures:
+    """Landmarks of every detected hand as one (n, 21, 3) float32 array.
+
+    x and y are in frame pixels, z is MediaPipe's relative depth. The buffer
+    is reused between frames, and the distance features used by the gesture
+    classifiers are computed for all hands at once.
+    """
+    # Fingertips and the joint each one is measured against, thumb first
+    TIPS = np.array([THUMB_TIP, INDEX_FINGER_TIP, MIDDLE_FINGER_TIP, RING_FINGER_TIP, PINKY_TIP])
+    BASES = np.array([THUMB_MCP, INDEX_FINGER_MCP, MIDDLE_FINGER_MCP, RING_FINGER_MCP, PINKY_MCP])
+
+    def __init__(self, max_hands=1):
+        self._buffer = np.zeros((max_hands, 21, 3), dtype=np.float32)
+        self.points = self._buffer[:0]
+        self.labels = []  # handedness per hand, "" where unknown
+        self.tip_dist = np.zeros((0, 5), dtype=np.float32)
+        self.base_dist = np.zeros((0, 5), dtype=np.float32)
+
+    @property
+    def count(self):
+        return len(self.points)
+
+    def load(self, results, frame_w, frame_h):
+        """Fill the buffer from a MediaPipe (or LandmarkResults) results object"""
+        points = getattr(results, "points", None)
+        if points is not None:
+            return self.load_array(points, frame_w, frame_h,
+                                   handedness_labels(results.multi_handedness, len(points)))
+        
+        hands = results.multi_hand_landmarks or []
+        self.labels = handedness_labels(results.multi_handedness, len(hands))
+        points = self._reserve(len(hands))
+        if hands:
+            points[:] = np.fromiter(
+                (v for hand in hands for lm in hand.landmark for v in (lm.x, lm.y, lm.z)),
+                dtype=np.float32, count=len(hands) * 63
+            ).reshape(len(hands), 21, 3)
+        self._compute(frame_w, frame_h)
+        return self.points
+
+    def load_array(self, normalized, frame_w, frame_h, labels=None):
+        """Fill the buffer from an (n, 21, 3) array of normalized landmarks"""
+        normalized = np.asarray(normalized, dtype=np.float32).reshape(-1, 21, 3)
+        self.labels = list(labels) if labels else [""] * len(normalized)
+        self._reserve(len(normalized))[:] = normalized
+        self._compute(frame_w, frame_h)
+        return self.points
+
+    def _reserve(self, n):
+        if n > len(self._buffer):
+            self._buffer = np.zeros((n, 21, 3), dtype=np.float32)
+        self.points = self._buffer[:n]
+        return self.points
+
+    def _compute(self, frame_w, frame_h):
+        xy = self.points[..., :2]
+        # Normalized -> pixel coordinates, clamped to the frame like int(x * w)
+        xy *= (frame_w, frame_h)
+        np.floor(xy, out=xy)
+        np.minimum(xy, (frame_w - 1, frame_h - 1), out=xy)
+        
+        wrist = xy[:, WRIST:WRIST + 1]
+        self.tip_dist = np.linalg.norm(xy[:, self.TIPS] - wrist, axis=-1)
+        self.base_dist = np.linalg.norm(xy[:, self.BASES] - wrist, axis=-1)
+
+
+class GestureClassifier:
+    """Base class for gestures recognized from HandFeatures.
+
+    classify() returns an array with one entry per hand. Stick to array
+    operations so adding a gesture doesn't add per-hand Python work.
+    GestureProcessor emits a GestureDetected event when a hand's value
+    changes to a truthy one; a classifier named "draw" or "palette"
+    replaces the built-in one instead.
+    """
+    name = None
+
+    def classify(self, features, frame_w, frame_h):
+        raise NotImplementedError
+
+
+class ThumbUpGesture(GestureClassifier):
+    """Thumb extended: its tip is well further from the wrist than its MCP"""
+    name = "draw"
+
+    def __init__(self, ratio=1.2):
+        self.ratio = ratio
+
+    def classify(self, features, frame_w, frame_h):
+        return features.tip_dist[:, 0] > features.base_dist[:, 0] * self.ratio
+
+
+class PinkyPaletteGesture(GestureClassifier):
+    """Palette color index under the pinky tip, -1 when not over the palette"""
+    name = "palette"
+
+    def __init__(self, palette):
+        self.palette = palette
+
+    def classify(self, features, frame_w, frame_h):
+        pinky = features.points[:, PINKY_TIP]
+        return self.palette.indices_at(pinky[:, 0], pinky[:, 1], frame_w, frame_h)
+
+
+def draw_shape(raster, mode, start, end, color, width):
+    """Rasterize a finished line, rectangle or circle"""
+    if mode == "line":
+        raster.line(start[0], start[1], end[0], end[1], color, width)
+    elif mode == "rectangle":
+        raster.rectangle(start[0], start[1], end[0], end[1], color, width)
+    elif mode == "circle":
+        radius = ((end[0] - start[0])**2 + (end[1] - start[1])**2)**0.5
+        raster.circle(start[0], start[1], radius, color, width)
+
+
+def simplify_polyline(points, epsilon):
+    """Ramer-Douglas-Peucker simplification of an (n, 2) point array"""
+    n = len(points)
+    if n < 3 or epsilon <= 0:
+        return points
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        i, j = stack.pop()
+        if j <= i + 1:
+            continue
+        seg = points[j] - points[i]
+        rel = points[i + 1:j] - points[i]
+        length = np.hypot(seg[0], seg[1])
+        if length == 0:
+            dist = np.hypot(rel[:, 0], rel[:, 1])
+        else:
+            dist = np.abs(seg[0] * rel[:, 1] - seg[1] * rel[:, 0]) / length
+        k = int(np.argmax(dist))
+        if dist[k] > epsilon:
+            mid = i + 1 + k
+            keep[mid] = True
+            stack.append((i, mid))
+            stack.append((mid, j))
+    return points[keep]
+
+
+class Stroke:
+    """One stroke: drawing mode, color name, brush width and an (n, 2) float32 point array"""
+    __slots__ = ("mode", "color", "width", "points")
+
+    def __init__(self, mode, color, width, points):
+        self.mode = mode
+        self.color = color
+        self.width = width
+        self.points = points
+
+    def render(self, raster):
+        if self.mode in SHAPE_MODES:
+            if len(self.points) == 2:
+                draw_shape(raster, self.mode, self.points[0].tolist(), self.points[1].tolist(),
+                           self.color, self.width)
+        elif len(self.points):
+            raster.polyline(self.points.tolist(), self.color, self.width)
+
+
+class StrokeStore:
+    """Strokes kept as compact point arrays, with online decimation.
+
+    While a stroke is drawn, points closer than min_distance to the last
+    kept point are dropped. When it ends, the stroke is simplified with
+    Ramer-Douglas-Peucker at tolerance epsilon. Every hand has its own
+    stroke in progress. Sessions save to JSON lines (.jsonl) or a
+    compressed NumPy archive (.npz).
+    """
+    VERSION = 1
+
+    def __init__(self, min_distance=2.0, epsilon=1.0):
+        self.min_distance = min_distance
+        self.epsilon = epsilon
+        self.strokes = []
+        self._current = {}  # hand -> ((mode, color, width), array("f") of x, y pairs)
+
+    def __len__(self):
+        return len(self.strokes)
+
+    @property
+    def point_count(self):
+        return sum(len(stroke.points) for stroke in self.strokes)
+
+    def begin(self, x, y, mode, color, width, hand=0):
+        self.end(hand=hand)
+        self._current[hand] = ((mode, color, width), array("f", (x, y)))
+
+    def add_point(self, x, y, hand=0):
+        """Append a point, returns the previous kept point or None if decimated"""
+        current = self._current.get(hand)
+        if current is None:
+            return None
+        buffer = current[1]
+        last_x, last_y = buffer[-2], buffer[-1]
+        if (x - last_x)**2 + (y - last_y)**2 < self.min_distance**2:
+            return None
+        buffer.extend((x, y))
+        return last_x, last_y
+
+    def end(self, end_point=None, hand=0):
+        """Finish the hand's current stroke; shapes keep just their start and end_point"""
+        current = self._current.pop(hand, None)
+        if current is None:
+            return None
+        stroke = self._finish(current, end_point)
+        if stroke is not None:
+            self.strokes.append(stroke)
+        return stroke
+
+    def _finish(self, current, end_point=None):
+        (mode, color, width), buffer = current
+        points = np.frombuffer(buffer, dtype=np.float32).reshape(-1, 2)
+        if mode in SHAPE_MODES:
+            if end_point is None:
+                # Released before it had a size, nothing to keep
+                return None
+            points = np.array([points[0], end_point], dtype=np.float32)
+        else:
+            points = simplify_polyline(points, self.epsilon).copy()
+        return Stroke(mode, color, width, points)
+
+    def end_all(self):
+        """Finish the strokes of every hand, e.g. when the input ends"""
+        for hand in list(self._current):
+            self.end(hand=hand)
+
+    def snapshot(self):
+        """Finished strokes plus freehand strokes in progress, which carry on drawing.
+
+        Shapes still being dragged out have no end point yet and are left out.
+        """
+        strokes = list(self.strokes)
+        for current in self._current.values():
+            stroke = self._finish(current)
+            if stroke is not None:
+                strokes.append(stroke)
+        return strokes
+
+    def clear(self):
+        """Drop the finished strokes; strokes in progress carry on from their last point"""
+        self.strokes = []
+        for hand, (style, buffer) in self._current.items():
+            self._current[hand] = (style, array("f", buffer[-2:]))
+
+    def extent(self):
+        """Size of the smallest top-left aligned area holding every finished stroke"""
+        right = bottom = 0.0
+        for stroke in self.strokes:
+            points = stroke.points
+            if not len(points):
+                continue
+            if stroke.mode == "circle" and len(points) == 2:
+                far = points[0] + float(np.hypot(*(points[1] - points[0])))
+            else:
+                far = points.max(axis=0)
+            right = max(right, float(far[0]) + stroke.width)
+            bottom = max(bottom, float(far[1]) + stroke.width)
+        return int(np.ceil(right)), int(np.ceil(bottom))
+
+    def render(self, raster):
+        """Rasterize every stroke, one polyline call per stroke"""
+        for stroke in self.strokes:
+            stroke.render(raster)
+
+    def save(self, filename):
+        """Write a snapshot of the drawing; strokes in progress are not ended"""
+        strokes = self.snapshot()
+        if filename.endswith(".npz"):
+            self._save_npz(filename, strokes)
+        else:
+            self._save_jsonl(filename, strokes)
+
+    @classmethod
+    def load(cls, filename, **kwargs):
+        store = cls(**kwargs)
+        if filename.endswith(".npz"):
+            store._load_npz(filename)
+        else:
+            store._load_jsonl(filename)
+        return store
+
+    def _save_jsonl(self, filename, strokes):
+        with open(filename, "w") as f:
+            f.write(json.dumps({"version": self.VERSION, "strokes": len(strokes)}) + "\n")
+            for stroke in strokes:
+                f.write(json.dumps({
+                    "mode": stroke.mode, "color": stroke.color, "width": stroke.width,
+                    "points": stroke.points.round(1).ravel().tolist()
+                }) + "\n")
+
+    def _load_jsonl(self, filename):
+        with open(filename) as f:
+            header = json.loads(f.readline())
+            if header.get("version") != self.VERSION:
+                raise ValueError(f"Unsupported session version: {header.get('version')}")
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                points = np.asarray(record["points"], dtype=np.float32).reshape(-1, 2)
+                self.strokes.append(Stroke(record["mode"], record["color"], record["width"], points))
+
+    def _save_npz(self, filename, strokes):
+        lengths = [len(stroke.points) for stroke in strokes]
+        np.savez_compressed(
+            filename,
+            version=np.array(self.VERSION),
+            points=(np.concatenate([s.points for s in strokes])
+                    if strokes else np.zeros((0, 2), dtype=np.float32)),
+            offsets=np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+            modes=np.array([s.mode for s in strokes], dtype=str),
+            colors=np.array([s.color for s in strokes], dtype=str),
+            widths=np.array([s.width for s in strokes], dtype=np.int16),
+        )
+
+    def _load_npz(self, filename):
+        with np.load(filename, allow_pickle=False) as data:
+            if int(data["version"]) != self.VERSION:
+                raise ValueError(f"Unsupported session version: {int(data['version'])}")
+            points, offsets = data["points"], data["offsets"]
+            for i, (mode, color, width) in enumerate(zip(data["modes"], data["colors"], data["widths"])):
+                self.strokes.append(Stroke(str(mode), str(color), int(width),
+                                           points[offsets[i]:offsets[i + 1]].copy()))
+
+
+class ColorChange(NamedTuple):
+    """A hand picked a color from the palette; hand is None when every hand changed"""
+    hand: object
+    color: str
+    kind = "color_change"
+
+
+class ModeChange(NamedTuple):
+    """The drawing mode a hand uses changed"""
+    hand: int
+    mode: str
+    kind = "mode_change"
+
+
+class PenDown(NamedTuple):
+    """A hand started a stroke or shape at (x, y)"""
+    hand: int
+    x: int
+    y: int
+    color: str
+    width: int
+    mode: str
+    kind = "pen_down"
+
+
+class PenMove(NamedTuple):
+    """A freehand stroke continued from (x0, y0) to (x1, y1)"""
+    hand: int
+    x0: int
+    y0: int
+    x1: int
+    y1: int
+    color: str
+    width: int
+    kind = "pen_move"
+
+
+class ShapePreview(NamedTuple):
+    """A line, rectangle or circle being dragged out from start to end"""
+    hand: int
+    mode: str
+    start: tuple
+    end: tuple
+    color: str
+    width: int
+    kind = "shape_preview"
+
+
+class ShapeCommit(NamedTuple):
+    """A shape was finished and belongs in the drawing"""
+    hand: int
+    mode: str
+    start: tuple
+    end: tuple
+    color: str
+    width: int
+    kind = "shape_commit"
+
+
+class PenUp(NamedTuple):
+    """A hand finished its stroke or shape"""
+    hand: int
+    kind = "pen_up"
+
+
+class Guidance(NamedTuple):
+    """Where a hand that is not drawing is pointing"""
+    hand: int
+    x: int
+    y: int
+    kind = "guidance"
+
+
+class HandLost(NamedTuple):
+    """A hand left the camera view"""
+    hand: int
+    kind = "hand_lost"
+
+
+class GestureDetected(NamedTuple):
+    """A custom GestureClassifier recognized its gesture; value is what classify() returned"""
+    hand: int
+    gesture: str
+    value: object
+    kind = "gesture"
+
+
+EVENT_TYPES = {cls.kind: cls for cls in (ColorChange, ModeChange, PenDown, PenMove, ShapePreview,
+                                          ShapeCommit, PenUp, Guidance, HandLost, GestureDetected)}
+
+
+def event_to_dict(event):
+    """JSON-ready form of an event: its fields plus a "type" key"""
+    record = event._asdict()
+    record["type"] = event.kind
+    return record
+
+
+def pack_events(events):
+    """Plain tuples for sending events to another process"""
+    return [(event.kind,) + tuple(event) for event in events]
+
+
+def unpack_events(packed):
+    return [EVENT_TYPES[record[0]](*record[1:]) for record in packed]
+
+
+class EventBus:
+    """Delivers gesture events to subscribers, one batch per frame.
+
+    Producers emit() events as they happen and flush() once per frame;
+    every subscriber is then called once with the frame's list of events,
+    so consumers can coalesce. Frames without events are not delivered.
+    """
+    def __init__(self):
+        self.subscribers = []
+        self.pending = []
+    
+    def subscribe(self, callback):
+        """Call callback(events) with every batch"""
+        self.subscribers.append(callback)
+        return callback
+    
+    def unsubscribe(self, callback):
+        self.subscribers.remove(callback)
+    
+    def emit(self, event):
+        self.pending.append(event)
+    
+    def flush(self):
+        if self.pending:
+            events, self.pending = self.pending, []
+            self.publish(events)
+    
+    def publish(self, events):
+        """Deliver a complete batch, e.g. one received from another process"""
+        for callback in self.subscribers:
+            callback(events)
+
+
+class HandState:
+    """Drawing state of one tracked hand, kept across frames"""
+    __slots__ = ("hand", "label", "wrist", "missing", "mode", "color", "reported_mode",
+                 "gestures", "drawing", "prev_x", "prev_y", "start_point")
+
+    def __init__(self, hand, label, color, mode=None):
+        self.hand = hand  # small integer ID, reused once the hand has left
+        self.label = label
+        self.wrist = None
+        self.missing = 0  # frames since the hand was last seen
+        self.mode = mode  # None follows the mode selected in the app
+        self.color = color
+        self.reported_mode = None  # last mode announced with a ModeChange event
+        self.gestures = {}  # custom gesture name -> last classified value
+        self.drawing = False
+        self.prev_x, self.prev_y = None, None
+        self.start_point = None  # For shapes like rectangles, circles
+
+
+class GestureProcessor:
+    """Turns hand landmarks into drawing actions.
+
+    Every tracked hand has its own HandState (color, mode and stroke in
+    progress), matched across frames by handedness and wrist position.
+    Decisions are emitted as typed events (PenDown, PenMove, PenUp,
+    ShapePreview, ShapeCommit, Guidance, ColorChange, ModeChange,
+    HandLost) on an EventBus that is flushed once per frame, so the same
+    gesture logic drives the Tk app, headless replays, loggers and the
+    multi-source engine.
+    """
+    def __init__(self, events, palette, classifiers=None, max_hands=1, hand_modes=None,
+                 match_distance=0.25, max_missing=5, transform=None):
+        self.events = events
+        self.palette = palette
+        self.transform = transform  # CanvasTransform from frame pixels to canvas, None is identity
+        self.max_hands = max_hands
+        self.features = HandFeatures(max_hands)
+        # Custom classifiers run after the built-in ones, or replace one with the same name
+        custom = list(classifiers or [])
+        names = {classifier.name for classifier in custom}
+        self.classifiers = [classifier for classifier in (ThumbUpGesture(), PinkyPaletteGesture(palette))
+                            if classifier.name not in names] + custom
+        self.custom_gestures = [c.name for c in custom if c.name not in ("draw", "palette")]
+        self.hand_modes = list(hand_modes or [])  # fixed mode per hand ID, if any
+        self.match_distance = match_distance  # fraction of the frame's long side
+        self.max_missing = max_missing
+        
+        # Drawing state variables
+        self.hands = {}  # hand ID -> HandState
+        self.current_color = "black"  # color new hands start with
+        self.last_colors = {}  # handedness label or hand ID -> color of a hand that left
+        self.lines_drawn = 0
+    
+    def set_color(self, color):
+        """Switch every hand, and hands found later, to color"""
+        self.current_color = color
+        self.last_colors = {}
+        for state in self.hands.values():
+            state.color = color
+        self.events.emit(ColorChange(None, color))
+        self.events.flush()
+    
+    def process(self, results, frame_w, frame_h, mode, brush_size, frame=None):
+        """Load landmarks from a results object and apply them"""
+        self.features.load(results, frame_w, frame_h)
+        self.apply(frame_w, frame_h, mode, brush_size, frame=frame)
+    
+    def classify(self, frame_w, frame_h):
+        """Run every classifier on the loaded features, keyed by gesture name"""
+        return {c.name: c.classify(self.features, frame_w, frame_h) for c in self.classifiers}
+    
+    def apply(self, frame_w, frame_h, mode, brush_size, frame=None):
+        """Apply all loaded hands in one pass, annotating the RGB frame if given"""
+        states = self.track(frame_w, frame_h, mode, brush_size)
+        if states:
+            gestures = self.classify(frame_w, frame_h)
+            points = self.features.points.astype(int)
+            for i, state in enumerate(states):
+                self.process_hand(state, points[i], {name: value[i] for name, value in gestures.items()},
+                                  frame_w, frame_h, mode, brush_size, frame)
+        self.events.flush()
+    
+    def track(self, frame_w, frame_h, mode, brush_size):
+        """Match the loaded hands to HandStates, returned in landmark order.
+
+        Hands missing for more than max_missing frames are released, so a
+        brief tracking dropout doesn't split a stroke.
+        """
+        wrists = self.features.points[:, WRIST, :2]
+        labels = self.features.labels
+        known = list(self.hands.values())
+        radius = self.match_distance * max(frame_w, frame_h)
+        matches = match_hands([state.wrist for state in known], wrists, radius,
+                              labels, [state.label for state in known], label_penalty=radius)
+        
+        states = []
+        for i, j in enumerate(matches.tolist()):
+            state = known[j] if j >= 0 else self._new_hand(labels[i])
+            state.wrist = tuple(wrists[i].tolist())
+            state.label = labels[i] or state.label
+            state.missing = 0
+            states.append(state)
+        
+        for state in [state for state in known if state not in states]:
+            state.missing += 1
+            if state.missing > self.max_missing:
+                self.release(state, mode, brush_size)
+                # Remember its color so the hand gets it back when tracking picks it up again
+                self.last_colors[state.hand] = state.color
+                if state.label:
+                    self.last_colors[state.label] = state.color
+                del self.hands[state.hand]
+                self.events.emit(HandLost(state.hand))
+        return states
+    
+    def _new_hand(self, label):
+        hand = 0
+        while hand in self.hands:
+            hand += 1
+        mode = self.hand_modes[hand] if hand < len(self.hand_modes) else None
+        color = self.last_colors.get(label) or self.last_colors.get(hand, self.current_color)
+        state = self.hands[hand] = HandState(hand, label, color, mode)
+        return state
+    
+    def process_hand(self, state, points, gestures, frame_w, frame_h, mode, brush_size, frame=None):
+        """Apply one hand given its state, pixel landmarks and classified gestures"""
+        index_tip = tuple(points[INDEX_FINGER_TIP, :2].tolist())
+        thumb_tip = tuple(points[THUMB_TIP, :2].tolist())
+        thumb_is_extended = bool(gestures["draw"])
+        mode = state.mode or mode
+        hand = state.hand
+        if mode != state.reported_mode:
+            state.reported_mode = mode
+            self.events.emit(ModeChange(hand, mode))
+        
+        # Select color with pinky finger if it is over a palette cell
+        color_index = gestures["palette"]
+        if color_index >= 0:
+            new_color = self.palette.color_names[color_index]
+            if new_color != state.color:
+                state.color = new_color
+                self.events.emit(ColorChange(hand, new_color))
+        
+        # Report custom gestures when they start (or change value)
+        for name in self.custom_gestures:
+            value = gestures[name]
+            value = value.item() if isinstance(value, np.generic) else value
+            if value != state.gestures.get(name):
+                state.gestures[name] = value
+                if value:
+                    self.events.emit(GestureDetected(hand, name, value))
+        
+        # Draw a circle at the index finger tip
+        if frame is not None:
+            cv2.circle(frame, index_tip, 10, (0, 255, 0), -1)
+            label_prefix = f"{hand + 1}: " if self.max_hands > 1 else ""
+            label_y = 30 + 25 * hand
+        
+        # Map the finger coordinates to the canvas
+        canvas_x, canvas_y = index_tip
+        if self.transform is not None:
+            canvas_x, canvas_y = self.transform.apply_int(canvas_x, canvas_y)
+        
+        # Drawing mode depends on thumb extension
+        if thumb_is_extended:
+            # Draw mode (thumb is extended)
+            if frame is not None:
+                cv2.circle(frame, thumb_tip, 10, (255, 0, 0), -1)
+                cv2.putText(frame, label_prefix + "Drawing Mode", (frame_w - 150, label_y), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
+            
+            if not state.drawing:
+                state.drawing = True
+                state.prev_x, state.prev_y = None, None
+                state.start_point = (canvas_x, canvas_y)
+                self.events.emit(PenDown(hand, canvas_x, canvas_y, state.color, brush_size, mode))
+            
+            if mode == "draw":
+                # Free drawing mode
+                if state.prev_x is not None and state.prev_y is not None:
+                    self.events.emit(PenMove(hand, state.prev_x, state.prev_y, canvas_x, canvas_y,
+                                             state.color, brush_size))
+                    self.lines_drawn += 1
+            elif mode in SHAPE_MODES and state.start_point is not None:
+                self.events.emit(ShapePreview(hand, mode, state.start_point, (canvas_x, canvas_y),
+                                              state.color, brush_size))
+            
+            state.prev_x, state.prev_y = canvas_x, canvas_y
+        else:
+            # Not drawing mode (thumb is down/sideways)
+            self.release(state, mode, brush_size)
+            
+            # Draw a guidance point on the canvas
+            self.events.emit(Guidance(hand, canvas_x, canvas_y))
+            
+            # Display guidance mode in frame
+            if frame is not None:
+                cv2.putText(frame, label_prefix + "Guidance Mode", (frame_w - 150, label_y), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (128, 128, 128), 2)
+    
+    def release(self, state, mode, brush_size):
+        """End the hand's stroke, committing the shape if it was drawing one"""
+        if not state.drawing:
+            return
+        mode = state.mode or mode
+        if mode != "draw" and state.start_point is not None:
+            self.events.emit(ShapeCommit(state.hand, mode, state.start_point, (state.prev_x, state.prev_y),
+                                         state.color, brush_size))
+            self.lines_drawn += 1
+        
+        state.drawing = False
+        state.start_point = None
+        self.events.emit(PenUp(state.hand))
+    
+    def release_all(self, mode, brush_size):
+        """End the strokes of every hand, e.g. when the input ends"""
+        for state in self.hands.values():
+            self.release(state, mode, brush_size)
+        self.events.flush()
+    
+    def reset(self):
+        """Forget every tracked hand; strokes in progress end without committing shapes"""
+        for hand, state in self.hands.items():
+            if state.drawing:
+                self.events.emit(PenUp(hand))
+            self.events.emit(HandLost(hand))
+        self.hands = {}
+        self.current_color = "black"
+        self.last_colors = {}
+        self.lines_drawn = 0
+        self.events.flush()
+
+
+class StrokeRenderer:
+    """Gesture event consumer that rasterizes strokes and keeps them in a StrokeStore.
+
+    Within a batch, each hand's pen moves are decimated by the store and
+    drawn as a single polyline instead of one raster call per segment.
+    """
+    def __init__(self, raster, strokes=None):
+        self.raster = raster
+        self.strokes = strokes if strokes is not None else StrokeStore()
+    
+    def __call__(self, events):
+        runs = {}  # hand -> (color, width, points kept this batch)
+        for event in events:
+            kind = event.kind
+            if kind == "pen_move":
+                # Only points that survive decimation are drawn, so the raster matches the saved stroke
+                start = self.strokes.add_point(event.x1, event.y1, hand=event.hand)
+                if start is not None:
+                    run = runs.get(event.hand)
+                    if run is None:
+                        run = runs[event.hand] = (event.color, event.width, [start])
+                    run[2].append((event.x1, event.y1))
+            elif kind == "pen_down":
+                self.strokes.begin(event.x, event.y, event.mode, event.color, event.width, hand=event.hand)
+            elif kind == "shape_commit":
+                draw_shape(self.raster, event.mode, event.start, event.end, event.color, event.width)
+                self.strokes.end(end_point=event.end, hand=event.hand)
+            elif kind == "pen_up":
+                self.strokes.end(hand=event.hand)
+        for color, width, points in runs.values():
+            self.raster.polyline(points, color, width)
+
+
+class StrokeRecorder(StrokeRenderer):
+    """Stroke renderer for headless runs, drawing into its own RasterCanvas"""
+    def __init__(self, width=640, height=480):
+        super().__init__(RasterCanvas(width, height))
+
+
+class BackgroundEventSink:
+    """Base for event consumers that do slow I/O, such as files or sockets.
+
+    Subscribing only queues the batch; write() runs on the sink's own
+    thread, so consumers never add latency to the render loop.
+    """
+    def __init__(self, name):
+        self._queue = SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+    
+    def __call__(self, events):
+        self._queue.put((time.time(), events))
+    
+    def write(self, timestamp, events):
+        raise NotImplementedError
+    
+    def close(self):
+        """Write out everything queued so far, then stop the thread"""
+        self._queue.put(None)
+        self._thread.join()
+    
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            self.write(*item)
+
+
+class EventLogger(BackgroundEventSink):
+    """Appends every gesture event to a JSON-lines file, one event per line"""
+    def __init__(self, filename):
+        self.file = open(filename, "w")
+        super().__init__("event-logger")
+    
+    def write(self, timestamp, events):
+        for event in events:
+            record = event_to_dict(event)
+            record["t"] = timestamp
+            self.file.write(json.dumps(record) + "\n")
+    
+    def close(self):
+        super().close()
+        self.file.close()
+
+
+class EventBroadcaster(BackgroundEventSink):
+    """Sends each batch of gesture events as one JSON UDP datagram"""
+    def __init__(self, host, port):
+        self.address = (host, port)
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if host.endswith(".255"):
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        super().__init__("event-broadcaster")
+    
+    def write(self, timestamp, events):
+        payload = json.dumps({"t": timestamp, "events": [event_to_dict(e) for e in events]})
+        try:
+            self.socket.sendto(payload.encode(), self.address)
+        except OSError:
+            # Nobody listening (or the datagram is too big) must not stop the stream
+            pass
+    
+    def close(self):
+        super().close()
+        self.socket.close()
+
+
+class HeadlessReplay:
+    """Runs the gesture-to-stroke pipeline on recorded input without a display"""
+    def __init__(self, mode="draw", brush_size=3, canvas_size=(640, 480), palette_layout="vertical",
+                 inference_size=320, use_roi=False, skip=1, trace=False, max_hands=1, hand_modes=None):
+        self.mode = mode
+        self.brush_size = brush_size
+        self.inference_size = inference_size
+        self.use_roi = use_roi
+        self.skip = skip
+        self.palette = PaletteOverlay(COLOR_HEX.items(), layout=palette_layout)
+        self.recorder = StrokeRecorder(*canvas_size)
+        self.events = EventBus()
+        self.events.subscribe(self.recorder)
+        self.max_hands = max_hands
+        self.gestures = GestureProcessor(self.events, self.palette, max_hands=max_hands,
+                                         hand_modes=hand_modes)
+        self.profiler = Profiler(window=None, trace=trace)
+        self.frame_path = FramePath()
+        self.allocations = None
+        self.tracker = None
+        self.frames = 0
+        self.elapsed = 0.0
+    
+    def run_video(self, path, record_landmarks=None, measure_allocations=False):
+        """Replay a video file through the same frame path, MediaPipe and gestures as the app"""
+        hands = create_hands(self.max_hands)
+        tracker = self.tracker = AdaptiveHandTracker(hands, inference_size=self.inference_size,
+                                                     use_roi=self.use_roi)
+        if self.skip != 1:
+            tracker = FrameSkippingTracker(tracker, skip=self.skip, asynchronous=False)
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise OSError(f"Cannot open video: {path}")
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        record = open(record_landmarks, "w") if record_landmarks else None
+        if measure_allocations:
+            self.allocations = AllocationMeter()
+            self.allocations.start()
+        capture_buf = None
+        start = time.perf_counter()
+        try:
+            while True:
+                ret, capture_buf = cap.read(capture_buf)
+                if not ret:
+                    break
+                with self.allocations.frame() if self.allocations else nullcontext():
+                    self._video_frame(capture_buf, tracker, fps, record)
+        finally:
+            self.elapsed += time.perf_counter() - start
+            if self.allocations is not None:
+                self.allocations.stop()
+            cap.release()
+            hands.close()
+            if record is not None:
+                record.close()
+    
+    def _video_frame(self, frame, tracker, fps, record):
+        with self.profiler.span("cvtColor"):
+            rgb_frame = self.frame_path.to_rgb(frame)
+        with self.profiler.span("flip"):
+            rgb_frame = self.frame_path.mirror(rgb_frame)
+        try:
+            with self.profiler.span("hands.process"):
+                if self.skip != 1:
+                    # Predict on video time, not wall time, so replays are repeatable
+                    results = tracker.process(rgb_frame, t=self.frames / fps)
+                else:
+                    results = tracker.process(rgb_frame)
+            with self.profiler.span("overlay"):
+                self.palette.apply(rgb_frame)
+            frame_h, frame_w, _ = rgb_frame.shape
+            if record is not None:
+                # Recorded before features.load turns them into pixels
+                hands_norm = results_to_array(results)
+                count = 0 if hands_norm is None else len(hands_norm)
+                record.write(json.dumps({
+                    "width": frame_w, "height": frame_h,
+                    "hands": [] if hands_norm is None else hands_norm.tolist(),
+                    "handedness": handedness_labels(results.multi_handedness, count)
+                }) + "\n")
+            with self.profiler.span("landmarks"):
+                self.gestures.features.load(results, frame_w, frame_h)
+            with self.profiler.span("canvas"):
+                self.gestures.apply(frame_w, frame_h, self.mode, self.brush_size)
+        finally:
+            self.frame_path.release(rgb_frame)
+        self.frames += 1
+    
+    def run_landmarks(self, path, fps=30.0):
+        """Replay a JSON-lines landmark recording (one frame per line)"""
+        # With --skip, recorded landmarks stand in for MediaPipe on the inferred frames
+        tracker = None
+        if self.skip != 1:
+            tracker = FrameSkippingTracker(RecordedTracker(), skip=self.skip, asynchronous=False)
+        start = time.perf_counter()
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                frame_w, frame_h = record["width"], record["height"]
+                with self.profiler.span("landmarks"):
+                    if tracker is None:
+                        self.gestures.features.load_array(record["hands"], frame_w, frame_h,
+                                                          record.get("handedness"))
+                    else:
+                        hands = np.asarray(record["hands"], dtype=np.float32).reshape(-1, 21, 3)
+                        results = LandmarkResults(hands if len(hands) else None, record.get("handedness"))
+                        results = tracker.process(results, t=self.frames / fps)
+                        self.gestures.features.load(results, frame_w, frame_h)
+                with self.profiler.span("canvas"):
+                    self.gestures.apply(frame_w, frame_h, self.mode, self.brush_size)
+                self.frames += 1
+        self.elapsed += time.perf_counter() - start
+    
+    def finish(self):
+        """Commit whatever stroke is still in progress when the input ends"""
+        self.gestures.release_all(self.mode, self.brush_size)
+    
+    def benchmark(self):
+        """Per-stage latency percentiles and end-to-end throughput"""
+        results = {
+            "frames": self.frames,
+            "fps": self.frames / self.elapsed if self.elapsed else 0.0,
+            "stages": self.profiler.summary(),
+        }
+        if self.tracker is not None:
+            # How often MediaPipe saw the hand crop instead of the whole frame
+            results["roi_frames"] = self.tracker.roi_frames
+            results["full_frames"] = self.tracker.full_frames
+        if self.allocations is not None:
+            results["allocations"] = self.allocations.summary()
+        return results
+
+
+class EngineSource:
+    """Capture, hand tracking and gestures for one engine source, inside a worker process"""
+    def __init__(self, source, options):
+        self.cap = cv2.VideoCapture(int(source) if source.isdigit() else source)
+        if not self.cap.isOpened():
+            raise OSError(f"Cannot open source: {source}")
+        self.hands = create_hands(options["max_hands"])
+        self.tracker = AdaptiveHandTracker(self.hands, inference_size=options["inference_size"],
+                                           use_roi=options["use_roi"])
+        self.mode = options["mode"]
+        self.brush_size = options["brush_size"]
+        self.batch = []
+        self.events = EventBus()
+        self.events.subscribe(self.batch.extend)
+        # Each source has its own overlay: its cached masks are built for one frame size
+        palette = PaletteOverlay(COLOR_HEX.items(), layout=options["palette_layout"])
+        self.gestures = GestureProcessor(self.events, palette, max_hands=options["max_hands"],
+                                         hand_modes=options["hand_modes"])
+        self.frame_path = FramePath()
+        self.capture_buf = None
+    
+    def step(self):
+        """Process the next frame; returns (found hands, inference seconds), or None at the end"""
+        ret, self.capture_buf = self.cap.read(self.capture_buf)
+        if not ret:
+            return None
+        rgb_frame = self.frame_path.prepare(self.capture_buf)
+        try:
+            start = time.perf_counter()
+            results = self.tracker.process(rgb_frame)
+            inference = time.perf_counter() - start
+            frame_h, frame_w, _ = rgb_frame.shape
+            self.gestures.process(results, frame_w, frame_h, self.mode, self.brush_size)
+        finally:
+            self.frame_path.release(rgb_frame)
+        return bool(results.multi_hand_landmarks), inference
+    
+    def take(self):
+        """Events since the last call, packed for the queue"""
+        packed = pack_events(self.batch)
+        self.batch.clear()
+        return packed
+    
+    def close(self):
+        """Finish open strokes; their events are left for take()"""
+        self.gestures.release_all(self.mode, self.brush_size)
+        self.cap.release()
+        self.hands.close()
+
+
+def _engine_worker(slots, sources, options, events, counters, stop):
+    """Worker process main loop: round-robin over its sources until they end or stop is set.
+
+    Sends (slot, batch) per frame with events, (slot, message) when a source
+    fails and (slot, None) when it has ended.
+    """
+    load_opencv()
+    load_mediapipe()
+    fields = len(DrawingEngine.STATS_FIELDS)
+    active = {}
+    try:
+        for slot, source in zip(slots, sources):
+            try:
+                active[slot] = EngineSource(source, options)
+            except Exception as e:
+                events.put((slot, f"{type(e).__name__}: {e}"))
+                events.put((slot, None))
+        
+        def send(item):
+            # A full queue means the renderers are behind: wait, which throttles capture
+            start = time.perf_counter()
+            while not stop.is_set():
+                try:
+                    events.put(item, timeout=0.1)
+                    break
+                except Full:
+                    pass
+            counters[item[0] * fields + 3] += time.perf_counter() - start
+        
+        while active and not stop.is_set():
+            for slot, source in list(active.items()):
+                try:
+                    step = source.step()
+                except Exception as e:
+                    # End just this source, the others in the worker carry on
+                    send((slot, f"{type(e).__name__}: {e}"))
+                    step = None
+                if step is None:
+                    source.close()
+                    send((slot, source.take()))
+                    send((slot, None))
+                    del active[slot]
+                    continue
+                found, inference = step
+                base = slot * fields
+                counters[base] += 1
+                counters[base + 1] += found
+                counters[base + 4] += inference
+                batch = source.take()
+                if batch:
+                    counters[base + 2] += len(batch)
+                    send((slot, batch))
+    finally:
+        for slot, source in active.items():
+            source.close()
+            events.put((slot, None))
+
+
+class DrawingEngine:
+    """Runs capture, hand tracking and gestures for many sources on a process pool.
+
+    Sources (camera indices or video paths) are split across worker
+    processes, one per core by default. Each processed frame sends its
+    drawing events as one batch over a bounded queue; renderers in this
+    process receive them through poll(). When renderers fall behind, workers
+    block on the queue, throttling capture instead of buffering without
+    limit. Per-source counters live in shared memory.
+    """
+    STATS_FIELDS = ("frames", "hand_frames", "events", "blocked", "inference")
+
+    def __init__(self, sources, workers=None, queue_size=64, mode="draw", brush_size=3,
+                 palette_layout="vertical", inference_size=320, use_roi=False, max_hands=1,
+                 hand_modes=None):
+        self.sources = [str(source) for source in sources]
+        self.workers = max(1, min(workers or os.cpu_count() or 1, len(self.sources)))
+        self.options = {
+            "mode": mode, "brush_size": brush_size, "palette_layout": palette_layout,
+            "inference_size": inference_size, "use_roi": use_roi, "max_hands": max_hands,
+            "hand_modes": hand_modes,
+        }
+        # Spawn, not fork: MediaPipe and OpenCV threads don't survive a fork
+        self.context = multiprocessing.get_context("spawn")
+        self.events = self.context.Queue(queue_size)
+        self.stop_event = self.context.Event()
+        self.counters = self.context.Array("d", len(self.sources) * len(self.STATS_FIELDS), lock=False)
+        self.buses = [EventBus() for _ in self.sources]
+        self.processes = []
+        self.finished = set()
+        self.errors = {}  # slot -> message from the worker
+        self._last_stats = None
+
+    def add_renderer(self, slot, consumer):
+        """Deliver the event batches of source slot to consumer(events)"""
+        self.buses[slot].subscribe(consumer)
+
+    @property
+    def done(self):
+        return len(self.finished) == len(self.sources)
+
+    def start(self):
+        for worker in range(self.workers):
+            slots = list(range(worker, len(self.sources), self.workers))
+            process = self.context.Process(
+                target=_engine_worker, name=f"engine-{worker}", daemon=True,
+                args=(slots, [self.sources[slot] for slot in slots], self.options,
+                      self.events, self.counters, self.stop_event)
+            )
+            process.start()
+            self.processes.append(process)
+        self._last_stats = (time.perf_counter(), [0.0] * len(self.sources))
+
+    def poll(self, timeout=0.0, max_batches=256):
+        """Deliver queued event batches to the renderers, returns how many were handled"""
+        handled = 0
+        while handled < max_batches:
+            try:
+                if handled == 0 and timeout:
+                    slot, events = self.events.get(timeout=timeout)
+                else:
+                    slot, events = self.events.get_nowait()
+            except Empty:
+                break
+            handled += 1
+            if events is None:
+                self.finished.add(slot)
+                continue
+            if isinstance(events, str):
+                self.errors[slot] = events
+                continue
+            self.buses[slot].publish(unpack_events(events))
+        return handled
+
+    def run(self, stats_interval=1.0, on_stats=None):
+        """Start the workers and deliver events until every source has ended"""
+        self.start()
+        last_stats = time.perf_counter()
+        try:
+            while not self.done:
+                if not self.poll(timeout=0.1) and not any(p.is_alive() for p in self.processes):
+                    break
+                if on_stats and time.perf_counter() - last_stats >= stats_interval:
+                    last_stats = time.perf_counter()
+                    on_stats(self.stats())
+        finally:
+            self.stop()
+
+    def stats(self):
+        """Per-source counters, plus frames/sec since the previous call"""
+        now = time.perf_counter()
+        fields = len(self.STATS_FIELDS)
+        last_t, last_frames = self._last_stats or (now, [0.0] * len(self.sources))
+        results = []
+        frames = []
+        for slot, source in enumerate(self.sources):
+            values = dict(zip(self.STATS_FIELDS, self.counters[slot * fields:(slot + 1) * fields]))
+            frames.append(values["frames"])
+            values["source"] = source
+            values["fps"] = (values["frames"] - last_frames[slot]) / (now - last_t) if now > last_t else 0.0
+            values["inference_ms"] = 1000 * values["inference"] / values["frames"] if values["frames"] else 0.0
+            values["finished"] = slot in self.finished
+            values["error"] = self.errors.get(slot)
+            results.append(values)
+        self._last_stats = (now, frames)
+        return results
+
+    def stop(self, timeout=5.0):
+        self.stop_event.set()
+        # Workers may be blocked sending, keep draining until they have exited
+        deadline = time.perf_counter() + timeout
+        while any(p.is_alive() for p in self.processes) and time.perf_counter() < deadline:
+            self.poll(timeout=0.05)
+        for process in self.processes:
+            process.join(timeout=0.1)
+            if process.is_alive():
+                process.terminate()
+        self.poll()
+
+
+class PreviewLayer:
+    """Persistent canvas items for live shape previews and the guidance cursor.
+
+    One item per preview kind is created up front, then moved with coords()
+    and restyled with itemconfig() only when color or width change. Idle
+    items are hidden instead of deleted, so no item IDs are churned at
+    camera rate.
+    """
+    def __init__(self, canvas):
+        self.canvas = canvas
+        hidden = dict(state=tk.HIDDEN)
+        self.shapes = {
+            "line": canvas.create_line(0, 0, 0, 0, tags="temp_shape", **hidden),
+            "rectangle": canvas.create_rectangle(0, 0, 0, 0, tags="temp_shape", **hidden),
+            "circle": canvas.create_oval(0, 0, 0, 0, tags="temp_shape", **hidden),
+        }
+        self.guidance = canvas.create_oval(0, 0, 0, 0, fill="gray", outline="black",
+                                           tags="guidance_point", **hidden)
+        self._styles = {}
+        self._visible = set()
+
+    def show_shape(self, mode, start, end, color, width):
+        """Move the preview for mode to span start..end, hiding the others"""
+        item = self.shapes[mode]
+        for other in self.shapes.values():
+            if other != item:
+                self._hide(other)
+        
+        if mode == "circle":
+            radius = ((end[0] - start[0])**2 + (end[1] - start[1])**2)**0.5
+            self.canvas.coords(item, start[0] - radius, start[1] - radius,
+                               start[0] + radius, start[1] + radius)
+        else:
+            self.canvas.coords(item, start[0], start[1], end[0], end[1])
+        
+        style = (COLOR_HEX.get(color, color), width)
+        if self._styles.get(item) != style:
+            color_option = "fill" if mode == "line" else "outline"
+            self.canvas.itemconfig(item, {color_option: style[0], "width": width})
+            self._styles[item] = style
+        self._show(item)
+
+    def hide_shapes(self):
+        for item in self.shapes.values():
+            self._hide(item)
+
+    def show_guidance(self, x, y):
+        self.canvas.coords(self.guidance, x - 5, y - 5, x + 5, y + 5)
+        self._show(self.guidance)
+
+    def hide_guidance(self):
+        self._hide(self.guidance)
+
+    def hide_all(self):
+        self.hide_shapes()
+        self.hide_guidance()
+
+    def _show(self, item):
+        if item not in self._visible:
+            self.canvas.itemconfig(item, state=tk.NORMAL)
+            self._visible.add(item)
+
+    def _hide(self, item):
+        if item in self._visible:
+            self.canvas.itemconfig(item, state=tk.HIDDEN)
+            self._visible.discard(item)
+
+
+class TileView:
+    """Shows a TiledCanvas on a Tk canvas with one image item per visible tile.
+
+    view maps canvas to screen coordinates (pan and zoom). refresh() only
+    uploads tiles that were painted since the last call; tiles that leave
+    the screen give up their PhotoImage. Zoom factors are powers of two so
+    scaled tiles stay whole pixels and line up without seams.
+    """
+    ZOOM_LEVELS = (0.125, 0.25, 0.5, 1.0, 2.0, 4.0)
+
+    def __init__(self, canvas, tiled, view=None):
+        self.canvas = canvas
+        self.tiled = tiled
+        self.view = view or CanvasTransform()
+        self.items = {}  # (tx, ty) -> (item, PhotoImage)
+        self.border = canvas.create_rectangle(0, 0, 0, 0, outline="#C0C0C0", dash=(4, 4))
+        self.set_view(self.view)
+
+    def set_view(self, view):
+        """Move to a new pan/zoom; tiles are re-scaled only when the zoom changes"""
+        if view.scale != self.view.scale:
+            for item, _ in self.items.values():
+                self.canvas.delete(item)
+            self.items = {}
+        self.view = view
+        x0, y0 = view.apply(0, 0)
+        x1, y1 = view.apply(*self.tiled.size)
+        self.canvas.coords(self.border, x0, y0, x1, y1)
+        self.canvas.tag_lower(self.border)
+        self._sync(self.tiled.take_dirty(), moved=True)
+
+    def refresh(self):
+        """Upload the tiles painted since the last refresh"""
+        if self.tiled.dirty_tiles:
+            self._sync(self.tiled.take_dirty())
+
+    def visible_tiles(self):
+        inverse = self.view.inverse()
+        x0, y0 = inverse.apply(0, 0)
+        x1, y1 = inverse.apply(self.canvas.winfo_width(), self.canvas.winfo_height())
+        tx0, ty0, tx1, ty1 = self.tiled.tile_range(x0, y0, x1, y1)
+        if (tx1 - tx0 + 1) * (ty1 - ty0 + 1) < len(self.tiled.tiles):
+            return {(tx, ty) for tx in range(tx0, tx1 + 1) for ty in range(ty0, ty1 + 1)
+                    if (tx, ty) in self.tiled.tiles}
+        return {(tx, ty) for tx, ty in self.tiled.tiles if tx0 <= tx <= tx1 and ty0 <= ty <= ty1}
+
+    def _sync(self, dirty, moved=False):
+        visible = self.visible_tiles()
+        for key in list(self.items):
+            if key not in visible:
+                # Scrolled away or cleared
+                self.canvas.delete(self.items.pop(key)[0])
+        
+        ts = self.tiled.tile_size
+        for key in visible:
+            entry = self.items.get(key)
+            if entry is None or key in dirty:
+                image = self.tiled.tiles[key]
+                if self.view.scale != 1.0:
+                    size = int(ts * self.view.scale)
+                    image = image.resize((size, size), Image.BILINEAR if size < ts else Image.NEAREST)
+                if entry is None:
+                    photo = ImageTk.PhotoImage(image)
+                    x, y = self.view.apply(key[0] * ts, key[1] * ts)
+                    item = self.canvas.create_image(round(x), round(y), anchor=tk.NW, image=photo)
+                    self.canvas.tag_lower(item)
+                    self.items[key] = (item, photo)
+                else:
+                    entry[1].paste(image)
+            elif moved:
+                x, y = self.view.apply(key[0] * ts, key[1] * ts)
+                self.canvas.coords(entry[0], round(x), round(y))
+
+
+def benchmark_preview(frames=600, mode="rectangle"):
+    """Time delete-and-recreate previews against PreviewLayer on a synthetic finger path"""
+    root = tk.Tk()
+    canvas = tk.Canvas(root, bg="white", width=640, height=480)
+    canvas.pack()
+    root.update()
+    
+    # Finger tracing a figure eight while a shape is dragged out from the center
+    t = np.linspace(0, 4 * np.pi, frames)
+    path = list(zip((320 + 200 * np.cos(t)).astype(int).tolist(),
+                    (240 + 150 * np.sin(2 * t)).astype(int).tolist()))
+    start = (320, 240)
+    
+    def recreate(x, y):
+        canvas.delete("temp_shape")
+        canvas.create_rectangle(start[0], start[1], x, y, width=3, outline="#000000", tags="temp_shape")
+        canvas.delete("guidance_point")
+        canvas.create_oval(x - 5, y - 5, x + 5, y + 5, fill="gray", outline="black",
+                           tags="guidance_point")
+    
+    layer = PreviewLayer(canvas)
+    
+    def persistent(x, y):
+        layer.show_shape(mode, start, (x, y), "black", 3)
+        layer.show_guidance(x, y)
+    
+    def next_item_id():
+        # Canvas item IDs only ever increase, so a probe item measures how many were allocated
+        probe = canvas.create_line(0, 0, 0, 0)
+        canvas.delete(probe)
+        return probe
+    
+    results = {}
+    for name, step in (("recreate", recreate), ("persistent", persistent)):
+        timer = Profiler(window=None)
+        first_id = next_item_id()
+        for x, y in path:
+            with timer.span(name):
+                step(x, y)
+                # Force the redraw so its cost is part of the frame
+                root.update_idletasks()
+        results[name] = timer.summary()[name]
+        results[name]["items_created"] = next_item_id() - first_id - 1
+        if name == "recreate":
+            canvas.delete("temp_shape", "guidance_point")
+    root.destroy()
+    return results
+
+
+def synthetic_hands(frames, count, frame_size=(640, 480)):
+    """(frames, count, 21, 3) normalized landmarks of open hands tracing small circles.
+
+    Hand i sits left of the palette, its thumb extended for 60 frames out
+    of every 80, so each hand keeps starting and finishing strokes.
+    """
+    # Thumb to pinky as rays from the wrist, fingers pointing up (negative y)
+    angles = np.radians([-150, -110, -90, -70, -50])
+    reach = np.array([[0.03, 0.05, 0.07, 0.09]] + [[0.06, 0.09, 0.11, 0.13]] * 4)
+    aspect = frame_size[0] / frame_size[1]
+    template = np.zeros((21, 3), dtype=np.float32)
+    template[1:, 0] = (np.cos(angles)[:, None] * reach).ravel()
+    template[1:, 1] = (np.sin(angles)[:, None] * reach).ravel() * aspect
+    folded = template[THUMB_TIP].copy()
+    folded[:2] = template[THUMB_MCP, :2] * 1.1
+    
+    t = np.arange(frames)
+    hands = np.empty((frames, count, 21, 3), dtype=np.float32)
+    for i in range(count):
+        phase = t * 0.05 + i
+        hands[:, i] = template
+        hands[:, i, :, 0] += (0.2 + 0.12 * i + 0.05 * np.cos(phase))[:, None]
+        hands[:, i, :, 1] += (0.55 + 0.05 * np.sin(phase))[:, None]
+        thumb_down = (t + 17 * i) % 80 >= 60
+        hands[thumb_down, i, THUMB_TIP] = folded + hands[thumb_down, i, WRIST]
+    return hands
+
+
+def benchmark_hands(max_hands=4, frames=600, frame_size=(640, 480)):
+    """Time gesture processing per frame with 1..max_hands hands drawing at once"""
+    load_opencv()
+    frame_w, frame_h = frame_size
+    palette = PaletteOverlay(COLOR_HEX.items())
+    profiler = Profiler(window=None)
+    strokes = {}
+    for count in range(1, max_hands + 1):
+        hands = synthetic_hands(frames, count, frame_size)
+        recorder = StrokeRecorder(frame_w, frame_h)
+        events = EventBus()
+        events.subscribe(recorder)
+        gestures = GestureProcessor(events, palette, max_hands=count)
+        name = f"{count} hand" + ("s" if count > 1 else "")
+        for frame in hands:
+            with profiler.span(name):
+                gestures.features.load_array(frame, frame_w, frame_h)
+                gestures.apply(frame_w, frame_h, "draw", 3)
+        gestures.release_all("draw", 3)
+        strokes[name] = len(recorder.strokes)
+    return profiler, strokes
+
+
+def benchmark_startup(max_hands=1, camera=None, resets=5):
+    """Time each cold startup stage, then model resets with and without a warm cache"""
+    start = time.perf_counter()
+    loader = StartupLoader(HandsCache(warm=False), max_hands, camera).run()
+    if loader.error is not None:
+        raise loader.error
+    results = dict(loader.times)
+    results["total"] = time.perf_counter() - start
+    loader.release()
+    
+    for warm in (False, True):
+        cache = HandsCache(warm=warm)
+        cache.release(cache.acquire(max_hands), max_hands)
+        samples = []
+        for _ in range(resets):
+            start = time.perf_counter()
+            hands = cache.acquire(max_hands)
+            samples.append(time.perf_counter() - start)
+            cache.release(hands, max_hands)
+        cache.close()
+        results["Warm model reset" if warm else "Cold model reset"] = float(np.mean(samples))
+    return results
+
+
+def run_headless(args):
+    """Entry point for --replay / --replay-landmarks / --load-session"""
+    load_opencv()
+    if args.load_session:
+        start = time.perf_counter()
+        store = StrokeStore.load(args.load_session)
+        # App sessions can cover a large panned canvas, so size the output to the strokes
+        width, height = store.extent()
+        size = (max(width, 640), max(height, 480))
+        raster = TiledCanvas(*size)
+        store.render(raster)
+        elapsed = time.perf_counter() - start
+        print(f"Rendered {len(store)} strokes ({store.point_count} points) in {elapsed * 1000:.1f} ms")
+        if args.output_png:
+            raster.save_png(args.output_png, size=size)
+        return
+    
+    if args.check_skip and not args.replay_landmarks:
+        raise SystemExit("--check-skip needs --replay-landmarks")
+    
+    def make_replay(skip, trace=False):
+        return HeadlessReplay(mode=args.mode, brush_size=args.brush_size,
+                              palette_layout=args.palette_layout,
+                              inference_size=args.inference_size, use_roi=args.roi,
+                              skip=skip, trace=trace,
+                              max_hands=args.max_hands, hand_modes=args.hand_modes)
+    
+    replay = make_replay(args.skip, trace=bool(args.trace))
+    sinks = open_event_sinks(args)
+    for sink in sinks:
+        replay.events.subscribe(sink)
+    try:
+        if args.replay:
+            replay.run_video(args.replay, record_landmarks=args.record_landmarks,
+                             measure_allocations=args.measure_allocations)
+        else:
+            replay.run_landmarks(args.replay_landmarks)
+        replay.finish()
+    finally:
+        for sink in sinks:
+            sink.close()
+    
+    if args.output_strokes:
+        replay.recorder.strokes.save(args.output_strokes)
+    if args.output_png:
+        replay.recorder.raster.save_png(args.output_png, size=(640, 480))
+    
+    results = replay.benchmark()
+    print(f"Processed {results['frames']} frames at {results['fps']:.1f} fps, "
+          f"{len(replay.recorder.strokes)} strokes, {replay.recorder.strokes.point_count} points")
+    if args.benchmark:
+        print(replay.profiler.report())
+    if "roi_frames" in results:
+        print(f"Hand tracking: {results['roi_frames']} crop frames, {results['full_frames']} full frames")
+    if "allocations" in results:
+        allocations = results["allocations"]
+        print(f"Allocations: {allocations['bytes_per_frame_mean'] / 1024:.1f} KiB/frame mean, "
+              f"{allocations['bytes_per_frame_p99'] / 1024:.1f} KiB/frame p99, "
+              f"GC collections per 1000 frames: "
+              + ", ".join(f"{c:.1f}" for c in allocations["gc_collections_per_1000_frames"]))
+    if args.benchmark_output:
+        with open(args.benchmark_output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.trace:
+        replay.profiler.export_chrome_trace(args.trace)
+    
+    if args.check_skip:
+        # Predicted frames must not change the drawing's gestures, only smooth the pen
+        reference = make_replay(1)
+        reference.run_landmarks(args.replay_landmarks)
+        reference.finish()
+        expected, got = len(reference.recorder.strokes), len(replay.recorder.strokes)
+        print(f"Strokes with --skip {args.skip}: {got}, every frame: {expected}")
+        if got != expected:
+            raise SystemExit("Frame skipping changed the number of strokes")
+
+
+def run_engine(args):
+    """Entry point for --serve: many sources on the process pool, rendered headless"""
+    engine = DrawingEngine(args.serve, workers=args.workers, queue_size=args.engine_queue,
+                           mode=args.mode, brush_size=args.brush_size,
+                           palette_layout=args.palette_layout, inference_size=args.inference_size,
+                           use_roi=args.roi, max_hands=args.max_hands,
+                           hand_modes=args.hand_modes)
+    recorders = []
+    for slot in range(len(engine.sources)):
+        recorder = StrokeRecorder()
+        engine.add_renderer(slot, recorder)
+        recorders.append(recorder)
+    
+    def print_stats(stats):
+        for source in stats:
+            print(f"[{source['source']}] {source['fps']:6.1f} fps  {int(source['frames'])} frames  "
+                  f"{int(source['hand_frames'])} with hands  {int(source['events'])} events  "
+                  f"inference {source['inference_ms']:.1f} ms  blocked {source['blocked']:.2f} s")
+            if source["error"]:
+                print(f"[{source['source']}] failed: {source['error']}")
+    
+    print(f"Serving {len(engine.sources)} sources on {engine.workers} worker processes")
+    start = time.perf_counter()
+    try:
+        engine.run(on_stats=print_stats)
+    except KeyboardInterrupt:
+        pass
+    elapsed = time.perf_counter() - start
+    
+    stats = engine.stats()
+    total_frames = sum(source["frames"] for source in stats)
+    for slot, (source, recorder) in enumerate(zip(engine.sources, recorders)):
+        recorder.strokes.end_all()
+        if args.serve_output:
+            os.makedirs(args.serve_output, exist_ok=True)
+            base = os.path.join(args.serve_output, f"source{slot}")
+            recorder.strokes.save(base + ".jsonl")
+            recorder.raster.save_png(base + ".png", size=(640, 480))
+        print(f"[{source}] {len(recorder.strokes)} strokes, {recorder.strokes.point_count} points")
+        if slot in engine.errors:
+            print(f"[{source}] failed: {engine.errors[slot]}")
+    print(f"Processed {int(total_frames)} frames in {elapsed:.1f} s "
+          f"({total_frames / elapsed if elapsed else 0.0:.1f} fps total)")
+
 
 class AdvancedHandGestureDrawingApp:
-    def __init__(self, root):
+    def __init__(self, root, queue_depth=1, drop_policy="oldest", palette_layout="vertical",
+                 inference_size=320, use_roi=False, skip=1, profile=False, trace_file=None,
+                 max_hands=1, hand_modes=None, canvas_size=(4096, 4096), camera=0,
+                 reload_model=False, hands_cache=None, sinks=()):
         self.root = root
         self.root.title("Advanced Hand Gesture Drawing")
         
         # Simplified app initialization
         self.session_start = datetime.now()
-        self.lines_drawn = 0
+        self.startup_begin = time.perf_counter()
+        
+        # Stage timings for the HUD and trace export, near free while disabled
+        self.trace_file = trace_file
+        self.profiler = Profiler(enabled=profile or bool(trace_file), trace=bool(trace_file))
+        self.display_rate = RateCounter()
         
         # Set up frames
         self.main_frame = tk.Frame(root)
@@ -35,11 +2971,39 @@ class AdvancedHandGestureDrawingApp:
         # Video display
         self.video_label = tk.Label(self.video_frame, text="Initializing camera...")
         self.video_label.pack()
+        self.video_photo = None
         
         # Canvas for drawing
         self.canvas = tk.Canvas(self.canvas_frame, bg="white", width=640, height=480)
         self.canvas.pack(fill="both", expand=True)
         
+        # Committed strokes are rasterized into lazily allocated tiles, one image
+        # item per visible tile; only tiles that changed are uploaded to Tk
+        self.raster = TiledCanvas(*canvas_size)
+        self.tile_view = TileView(self.canvas, self.raster)
+        self.zoom = 1.0
+        self.pan_x, self.pan_y = 0.0, 0.0  # canvas point shown at the top-left corner
+        self.pan_anchor = None
+        self.canvas.bind("<Configure>", self.on_canvas_resize)
+        
+        # Drag to pan, mouse wheel to zoom (Button-4/5 are the wheel on X11)
+        self.canvas.bind("<ButtonPress-1>", self.start_pan)
+        self.canvas.bind("<B1-Motion>", self.pan)
+        self.canvas.bind("<MouseWheel>", lambda e: self.zoom_at(e.x, e.y, 1 if e.delta > 0 else -1))
+        self.canvas.bind("<Button-4>", lambda e: self.zoom_at(e.x, e.y, 1))
+        self.canvas.bind("<Button-5>", lambda e: self.zoom_at(e.x, e.y, -1))
+        
+        # Strokes are also kept as decimated point arrays for saving sessions
+        self.strokes = StrokeStore()
+        
+        # Shape previews and the guidance cursor are moved, never re-created;
+        # every hand gets its own layer the first time it shows up
+        self.previews = {}
+        
+        # Performance HUD in the top-left corner of the canvas
+        self.hud_item = self.canvas.create_text(8, 8, anchor=tk.NW, text="", fill="#404040",
+                                                font=("Courier", 9), state=tk.HIDDEN)
+        
         # Status bar
         self.status_bar = tk.Label(self.canvas_frame, text="Ready. Thumb up to draw with index finger.", bd=1, relief=tk.SUNKEN, anchor=tk.W)
         self.status_bar.pack(side=tk.BOTTOM, fill="x")
@@ -56,6 +3020,20 @@ class AdvancedHandGestureDrawingApp:
         self.save_button = ttk.Button(self.controls, text="Save Drawing", command=self.save_drawing)
         self.save_button.pack(side=tk.LEFT, padx=10)
         
+        # Session buttons
+        self.save_session_button = ttk.Button(self.controls, text="Save Session", command=self.save_session)
+        self.save_session_button.pack(side=tk.LEFT, padx=10)
+        self.load_session_button = ttk.Button(self.controls, text="Load Session", command=self.load_session)
+        self.load_session_button.pack(side=tk.LEFT, padx=10)
+        
+        # Start over for the next user
+        self.new_session_button = ttk.Button(self.controls, text="New Session", command=self.new_session)
+        self.new_session_button.pack(side=tk.LEFT, padx=10)
+        
+        # Reset pan/zoom
+        self.reset_view_button = ttk.Button(self.controls, text="Reset View", command=self.reset_view)
+        self.reset_view_button.pack(side=tk.LEFT, padx=10)
+        
         # Mode selection
         self.mode_var = tk.StringVar(value="draw")
         ttk.Label(self.controls, text="Mode:").pack(side=tk.LEFT, padx=(20, 5))
@@ -77,59 +3055,150 @@ class AdvancedHandGestureDrawingApp:
         self.status_label = ttk.Label(self.controls, textvariable=self.status_var)
         self.status_label.pack(side=tk.RIGHT, padx=10)
         
-        # Drawing state variables
-        self.drawing = False
-        self.prev_x, self.prev_y = None, None
-        self.start_point = None  # For shapes like rectangles, circles
-        self.current_color = "black"
+        # Session timer
+        self.session_var = tk.StringVar(value="Session: 00:00:00")
+        ttk.Label(self.controls, textvariable=self.session_var).pack(side=tk.RIGHT, padx=10)
         
-        # Available colors for selection with pinky finger
-        self.colors = {
-            "bottom_left": "red",
-            "bottom_center": "green",
-            "bottom_right": "blue",
-            "mid_left": "yellow",
-            "mid_center": "black",
-            "mid_right": "purple",
-            "top_left": "orange",
-            "top_center": "brown",
-            "top_right": "cyan"
-        }
+        # Performance HUD toggle
+        self.hud_var = tk.BooleanVar(value=profile)
+        ttk.Checkbutton(self.controls, text="HUD", variable=self.hud_var,
+                        command=self.toggle_hud).pack(side=tk.RIGHT, padx=10)
         
-        # MediaPipe hands setup
-        self.mp_hands = mp.solutions.hands
-        self.mp_drawing = mp.solutions.drawing_utils
-        self.mp_drawing_styles = mp.solutions.drawing_styles
+        # Pipeline throughput display
+        self.perf_var = tk.StringVar(value="")
+        self.perf_label = ttk.Label(self.controls, textvariable=self.perf_var)
+        self.perf_label.pack(side=tk.RIGHT, padx=10)
+        self.last_perf_update = 0.0
         
-        self.hands = self.mp_hands.Hands(
-            max_num_hands=1,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
+        # Hand tracking settings; MediaPipe itself is loaded in the background
+        self.max_hands = max_hands
+        self.inference_size = inference_size
+        self.use_roi = use_roi
+        self.skip = skip
+        self.queue_depth = queue_depth
+        self.drop_policy = drop_policy
+        self.hands_cache = hands_cache or HandsCache(warm=not reload_model)
+        self.hands = None
+        self.tracker = None
+        self.tracker_lock = threading.Lock()
+        self.cap = None
+        self.pipeline = None
+        self.frame_path = FramePath()
         
         # Virtual color palette
-        self.color_palette = self.create_color_palette()
+        self.color_palette = self.create_color_palette(palette_layout)
+        
+        # Gesture logic emits events once per frame; the renderer, previews, status bar
+        # and any loggers each get the whole batch
+        self.events = EventBus()
+        self.renderer = StrokeRenderer(self.raster, self.strokes)
+        self.events.subscribe(self.on_gesture_events)
+        self.sinks = list(sinks)
+        for sink in self.sinks:
+            self.events.subscribe(sink)
+        self.gestures = GestureProcessor(self.events, self.color_palette, max_hands=max_hands,
+                                         hand_modes=hand_modes)
+        self.update_view()
         
-        # Start video capture
-        self.cap = cv2.VideoCapture(0)
-        self.update_frame()
+        # Imports, model and camera load on a background thread while the window shows
+        self.loader = StartupLoader(self.hands_cache, max_hands, camera).start()
+        self.poll_startup()
+        self.window_time = time.perf_counter() - self.startup_begin
         
         # Start session timer
         self.update_session_timer()
+        self.toggle_hud()
+    
+    def poll_startup(self):
+        """Show loading progress in the status bar until the background loader is done"""
+        if not self.loader.done.is_set():
+            elapsed = time.perf_counter() - self.startup_begin
+            self.status_bar.config(text=f"{self.loader.stage}... ({elapsed:.1f} s)")
+            self.root.after(50, self.poll_startup)
+            return
+        self.finish_startup()
+    
+    def finish_startup(self):
+        """Take over what the loader built and start the capture/inference pipeline"""
+        loader = self.loader
+        if loader.error is not None:
+            loader.release()
+            self.status_bar.config(text=f"Startup failed: {loader.error}")
+            self.video_label.config(text=f"Camera unavailable: {loader.error}")
+            return
+        self.install_hands(loader.hands)
+        
+        first_start = self.pipeline is None
+        if first_start:
+            self.mp_hands = mp.solutions.hands
+            self.mp_drawing = mp.solutions.drawing_utils
+            self.mp_drawing_styles = mp.solutions.drawing_styles
+            
+            # Landmark styles are BGR, frames are RGB: swap the colors once up front
+            self.landmark_style = {
+                k: dataclasses.replace(spec, color=spec.color[::-1])
+                for k, spec in self.mp_drawing_styles.get_default_hand_landmarks_style().items()
+            }
+            self.connection_style = {
+                k: dataclasses.replace(spec, color=spec.color[::-1])
+                for k, spec in self.mp_drawing_styles.get_default_hand_connections_style().items()
+            }
+            
+            # Start video capture on a pipelined capture/inference engine
+            self.cap = loader.cap
+            self.pipeline = FramePipeline(self.cap, self.process_frame,
+                                          queue_depth=self.queue_depth, drop_policy=self.drop_policy,
+                                          on_result_drop=lambda item: self.frame_path.release(item[0]))
+            self.pipeline.start()
+            self.update_frame()
+        
+        elapsed = time.perf_counter() - self.startup_begin
+        stages = ", ".join(f"{stage.split()[-1]} {seconds:.1f} s" for stage, seconds in loader.times.items())
+        if first_start:
+            stages = f"window {self.window_time:.2f} s, " + stages
+        self.status_bar.config(text=f"Ready in {elapsed:.1f} s ({stages}). Thumb up to draw with index finger.")
     
-    def create_color_palette(self):
+    def install_hands(self, hands):
+        """Track with a Hands instance, handing the previous one back to the cache"""
+        # Downscale and crop frames around the hand before running MediaPipe
+        tracker = AdaptiveHandTracker(hands, inference_size=self.inference_size, use_roi=self.use_roi)
+        
+        # Optionally run MediaPipe on fewer frames and predict landmarks in between
+        if self.skip != 1:
+            tracker = FrameSkippingTracker(tracker, skip=self.skip)
+        
+        with self.tracker_lock:
+            old_tracker, old_hands = self.tracker, self.hands
+            self.tracker, self.hands = tracker, hands
+        if isinstance(old_tracker, FrameSkippingTracker):
+            old_tracker.close()
+        if old_hands is not None:
+            self.hands_cache.release(old_hands, self.max_hands)
+    
+    def new_session(self):
+        """Start over for the next user: empty canvas, fresh hand tracking, timer at zero"""
+        self.gestures.reset()
+        self.gestures.set_color(self.gestures.current_color)
+        self.clear_canvas()
+        self.session_start = datetime.now()
+        if not self.loader.done.is_set() or self.hands is None:
+            return
+        
+        # Fresh trackers around the cached model; with --reload-model the old Hands is
+        # closed and a new one loads on the loader thread while the UI keeps running
+        with self.tracker_lock:
+            tracker, hands = self.tracker, self.hands
+            self.tracker = self.hands = None
+        if isinstance(tracker, FrameSkippingTracker):
+            tracker.close()
+        self.hands_cache.release(hands, self.max_hands)
+        self.startup_begin = time.perf_counter()
+        self.loader = StartupLoader(self.hands_cache, self.max_hands, camera=None).start()
+        self.poll_startup()
+    
+    def create_color_palette(self, layout="vertical"):
         """Create UI color buttons in the side panel"""
-        colors = [
-            ("red", "#FF0000"),
-            ("green", "#00FF00"),
-            ("blue", "#0000FF"),
-            ("yellow", "#FFFF00"),
-            ("black", "#000000"),
-            ("purple", "#800080"),
-            ("orange", "#FFA500"),
-            ("brown", "#A52A2A"),
-            ("cyan", "#00FFFF")
-        ]
+        colors = list(COLOR_HEX.items())
         
         # Create color buttons
         self.color_buttons = []
@@ -146,271 +3215,503 @@ class AdvancedHandGestureDrawingApp:
             lbl.pack(pady=0, padx=10)
         
         # Also create a virtual color palette for the video feed
-        palette = np.ones((480, 50, 3), dtype=np.uint8) * 255
+        return PaletteOverlay(colors, layout=layout)
         
-        # Vertical strips of colors
-        cell_h = 480 // len(colors)
-        for i, (name, hex_color) in enumerate(colors):
-            # Convert hex to BGR (OpenCV uses BGR)
-            r = int(hex_color[1:3], 16)
-            g = int(hex_color[3:5], 16)
-            b = int(hex_color[5:7], 16)
-            
-            y1, y2 = i * cell_h, (i + 1) * cell_h
-            palette[y1:y2, :] = (b, g, r)  # BGR format for OpenCV
+    def set_color(self, color_name):
+        """Set the drawing color of every hand when a color button is clicked"""
+        self.gestures.set_color(color_name)
+    
+    def preview_for(self, hand):
+        """Preview layer of a hand, created the first time the hand is seen"""
+        if hand not in self.previews:
+            self.previews[hand] = PreviewLayer(self.canvas)
+            self.canvas.tag_raise(self.hud_item)
+        return self.previews[hand]
+    
+    def hand_prefix(self, hand):
+        return f"Hand {hand + 1}: " if self.max_hands > 1 and hand is not None else ""
+    
+    def on_gesture_events(self, events):
+        """Apply one frame of gesture events: strokes first, then previews and status.
+
+        Only the last preview, guidance position and status text of a batch
+        reach Tk; intermediate ones would be overwritten before the next redraw.
+        """
+        self.renderer(events)
+        shapes, cursors = {}, {}  # hand -> last ShapePreview / Guidance, or None to hide it
+        status = color = None
+        for event in events:
+            kind = event.kind
+            if kind == "shape_preview":
+                shapes[event.hand] = event
+            elif kind == "guidance":
+                cursors[event.hand] = event
+            elif kind == "pen_down":
+                cursors[event.hand] = None
+                status = f"{self.hand_prefix(event.hand)}Drawing with {event.color}. Mode: {event.mode}"
+            elif kind == "shape_commit":
+                shapes[event.hand] = None
+            elif kind == "hand_lost":
+                shapes[event.hand] = cursors[event.hand] = None
+            elif kind == "pen_up":
+                status = f"{self.hand_prefix(event.hand)}Guidance mode. Thumb up to start drawing."
+            elif kind == "gesture":
+                status = f"{self.hand_prefix(event.hand)}Gesture: {event.gesture}"
+            elif kind == "color_change":
+                color = f"{self.hand_prefix(event.hand)}Current Color: {event.color}"
+                status = f"{self.hand_prefix(event.hand)}Color selected: {event.color}"
         
-        return palette
+        view = self.tile_view.view
+        for hand, event in shapes.items():
+            if event is None:
+                self.preview_for(hand).hide_shapes()
+            else:
+                self.preview_for(hand).show_shape(event.mode, view.apply(*event.start),
+                                                  view.apply(*event.end), event.color,
+                                                  max(1, round(event.width * view.scale)))
+        for hand, event in cursors.items():
+            if event is None:
+                self.preview_for(hand).hide_guidance()
+            else:
+                self.preview_for(hand).show_guidance(*view.apply(event.x, event.y))
         
-    def set_color(self, color_name):
-        """Set the current drawing color when a color button is clicked"""
-        self.current_color = color_name
-        self.status_var.set(f"Current Color: {color_name}")
-        self.status_bar.config(text=f"Color selected: {color_name}")
+        if color is not None:
+            self.status_var.set(color)
+        if status is not None and status != self.status_bar.cget("text"):
+            self.status_bar.config(text=status)
     
     # Remove the statistics-related methods that are no longer needed
     
     def clear_canvas(self):
         """Clear the canvas"""
-        self.canvas.delete("all")
+        for preview in self.previews.values():
+            preview.hide_all()
+        self.strokes.clear()
+        self.raster.clear()
+        self.refresh_raster()
         self.status_bar.config(text="Canvas cleared. Thumb up to draw with index finger.")
     
+    def on_canvas_resize(self, event):
+        """Grow the canvas to at least the window and show the tiles that came into view"""
+        self.raster.resize(event.width, event.height)
+        self.tile_view.set_view(self.tile_view.view)
+    
+    def refresh_raster(self):
+        """Upload the tiles strokes were committed to since the last frame"""
+        self.tile_view.refresh()
+    
+    def update_view(self):
+        """Apply the current pan/zoom to the tiles and to the finger mapping"""
+        view = CanvasTransform(self.zoom, -self.pan_x * self.zoom, -self.pan_y * self.zoom)
+        self.tile_view.set_view(view)
+        # Camera pixels map 1:1 onto screen pixels, so fingers draw where the view shows
+        self.gestures.transform = view.inverse()
+    
+    def start_pan(self, event):
+        self.pan_anchor = (event.x, event.y, self.pan_x, self.pan_y)
+    
+    def pan(self, event):
+        """Drag the view with the mouse"""
+        x, y, pan_x, pan_y = self.pan_anchor
+        self.pan_x = pan_x - (event.x - x) / self.zoom
+        self.pan_y = pan_y - (event.y - y) / self.zoom
+        self.update_view()
+    
+    def zoom_at(self, x, y, step):
+        """Zoom one level in (step=1) or out (step=-1), keeping the point under the cursor still"""
+        levels = TileView.ZOOM_LEVELS
+        zoom = levels[min(max(levels.index(self.zoom) + step, 0), len(levels) - 1)]
+        if zoom == self.zoom:
+            return
+        canvas_x, canvas_y = self.pan_x + x / self.zoom, self.pan_y + y / self.zoom
+        self.zoom = zoom
+        self.pan_x, self.pan_y = canvas_x - x / zoom, canvas_y - y / zoom
+        self.update_view()
+        self.status_bar.config(text=f"Zoom {zoom * 100:g}%")
+    
+    def reset_view(self):
+        self.zoom = 1.0
+        self.pan_x, self.pan_y = 0.0, 0.0
+        self.update_view()
+    
+    def save_session(self):
+        """Save the strokes to a session file that can be reloaded later"""
+        filename = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}.npz"
+        try:
+            self.strokes.save(filename)
+            self.status_bar.config(text=f"Session saved as {filename}")
+        except OSError as e:
+            self.status_bar.config(text=f"Error saving session: {e}")
+    
+    def load_session(self):
+        """Replace the drawing with the strokes from a session file"""
+        filename = filedialog.askopenfilename(
+            title="Load Session",
+            filetypes=[("Sessions", "*.npz *.jsonl"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+        try:
+            strokes = StrokeStore.load(filename)
+        except (OSError, ValueError, KeyError) as e:
+            self.status_bar.config(text=f"Error loading session: {e}")
+            return
+        # End strokes in progress the normal way; the hand starts a new one in the loaded session
+        self.gestures.release_all(self.mode_var.get(), self.brush_size_var.get())
+        self.strokes = self.renderer.strokes = strokes
+        for preview in self.previews.values():
+            preview.hide_all()
+        self.raster.clear()
+        self.strokes.render(self.raster)
+        self.refresh_raster()
+        self.status_bar.config(text=f"Loaded {len(strokes)} strokes from {os.path.basename(filename)}")
+    
     def save_drawing(self):
         """Save the current drawing to a file"""
-        # Get canvas dimensions
-        x = self.root.winfo_rootx() + self.canvas.winfo_x()
-        y = self.root.winfo_rooty() + self.canvas.winfo_y()
-        x1 = x + self.canvas.winfo_width()
-        y1 = y + self.canvas.winfo_height()
-        
         # Create filename with timestamp
         filename = f"drawing_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
         
         try:
-            # Take screenshot of canvas area
-            ImageTk.PhotoImage(self.canvas).save(filename)
+            # Assemble the painted tiles directly, no screenshot needed; an empty
+            # drawing is saved at the size of the view
+            size = None
+            if self.raster.extent() is None:
+                size = (self.canvas.winfo_width(), self.canvas.winfo_height())
+            self.raster.save_png(filename, size=size)
             self.status_bar.config(text=f"Drawing saved as {filename}")
-        except:
-            # Alternative method using PIL
-            try:
-                import pyscreenshot as ImageGrab
-                ImageGrab.grab(bbox=(x, y, x1, y1)).save(filename)
-                self.status_bar.config(text=f"Drawing saved as {filename}")
-            except:
-                self.status_bar.config(text="Error saving drawing. Screenshot functionality may not be available.")
+        except OSError as e:
+            self.status_bar.config(text=f"Error saving drawing: {e}")
     
-    def update_frame(self):
-        """Update video frame and process hand tracking"""
-        ret, frame = self.cap.read()
-        if ret:
-            # Flip the frame horizontally for a more intuitive mirror view
-            frame = cv2.flip(frame, 1)
+    def process_frame(self, frame):
+        """Prepare a captured frame and run hand tracking (inference thread)"""
+        profiler = self.profiler
+        
+        # One conversion to a mirrored RGB frame, shared by MediaPipe and the display
+        with profiler.span("frame_path"):
+            frame = self.frame_path.prepare(frame)
+        
+        try:
+            # Process the frame with MediaPipe (nothing to track while a new model loads)
+            with profiler.span("hands.process"), self.tracker_lock:
+                results = self.tracker.process(frame) if self.tracker is not None else LandmarkResults(None)
             
             # Overlay the color palette on the right side of the frame
-            h, w, _ = self.color_palette.shape
-            right_edge = frame.shape[1] - w - 10
-            roi = frame[10:10+h, right_edge:right_edge+w]
-            
-            # Only try to blend if ROI is valid
-            if roi.shape[0] > 0 and roi.shape[1] > 0:
-                # Create a mask from the palette for proper overlay
-                palette_gray = cv2.cvtColor(self.color_palette, cv2.COLOR_BGR2GRAY)
-                _, mask = cv2.threshold(palette_gray, 1, 255, cv2.THRESH_BINARY)
-                mask_inv = cv2.bitwise_not(mask)
-                
-                # Now blend the palette with the original frame
-                try:
-                    frame_bg = cv2.bitwise_and(roi, roi, mask=mask_inv)
-                    palette_fg = cv2.bitwise_and(self.color_palette, self.color_palette, mask=mask)
-                    frame[10:10+h, right_edge:right_edge+w] = cv2.add(frame_bg, palette_fg)
-                except:
-                    # If there's a shape mismatch or other error, just overlay directly
-                    if h <= frame.shape[0] - 10 and w <= frame.shape[1] - right_edge:
-                        frame[10:10+h, right_edge:right_edge+w] = self.color_palette
-                
-            # Add text labels to show what each color is
-            cv2.putText(frame, "Colors", (right_edge + 5, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
-            
-            # Convert the BGR image to RGB for MediaPipe
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            frame_h, frame_w, _ = frame.shape
-            
-            # Process the frame with MediaPipe
-            results = self.hands.process(rgb_frame)
+            with profiler.span("overlay"):
+                self.color_palette.apply(frame)
             
             # Draw hand landmarks on the frame
             if results.multi_hand_landmarks:
-                for hand_landmarks in results.multi_hand_landmarks:
-                    # Draw hand landmarks
-                    self.mp_drawing.draw_landmarks(
-                        frame, 
-                        hand_landmarks, 
-                        self.mp_hands.HAND_CONNECTIONS,
-                        self.mp_drawing_styles.get_default_hand_landmarks_style(),
-                        self.mp_drawing_styles.get_default_hand_connections_style()
-                    )
-                    
-                    # Get landmark positions
-                    landmarks = {}
-                    for i, landmark in enumerate(hand_landmarks.landmark):
-                        x_px = min(int(landmark.x * frame_w), frame_w - 1)
-                        y_px = min(int(landmark.y * frame_h), frame_h - 1)
-                        landmarks[i] = (x_px, y_px)
-                    
-                    # Get position of important fingers and finger landmarks
-                    thumb_tip = landmarks[self.mp_hands.HandLandmark.THUMB_TIP.value]
-                    thumb_ip = landmarks[self.mp_hands.HandLandmark.THUMB_IP.value]
-                    thumb_mcp = landmarks[self.mp_hands.HandLandmark.THUMB_MCP.value]
-                    index_tip = landmarks[self.mp_hands.HandLandmark.INDEX_FINGER_TIP.value]
-                    index_dip = landmarks[self.mp_hands.HandLandmark.INDEX_FINGER_DIP.value]
-                    pinky_tip = landmarks[self.mp_hands.HandLandmark.PINKY_TIP.value]
-                    wrist = landmarks[self.mp_hands.HandLandmark.WRIST.value]
-                    
-                    # Detect if thumb is extended (distance from thumb tip to wrist is significantly greater than distance from MCP to wrist)
-                    thumb_wrist_dist = ((thumb_tip[0] - wrist[0])**2 + (thumb_tip[1] - wrist[1])**2)**0.5
-                    thumb_mcp_wrist_dist = ((thumb_mcp[0] - wrist[0])**2 + (thumb_mcp[1] - wrist[1])**2)**0.5
-                    
-                    # Thumb is considered extended if its tip is significantly further from the wrist than the MCP
-                    thumb_is_extended = thumb_wrist_dist > thumb_mcp_wrist_dist * 1.2
-                    
-                    # Check if pinky is in the color palette area (now on the right side)
-                    right_edge = frame.shape[1] - self.color_palette.shape[1] - 10
-                    in_palette_area = (right_edge <= pinky_tip[0] <= right_edge + self.color_palette.shape[1] and 
-                                       10 <= pinky_tip[1] <= 10 + self.color_palette.shape[0])
-                    
-                    # Select color with pinky finger if in palette area
-                    if in_palette_area:
-                        # The color palette is now vertical, so we only need the y-coordinate
-                        rel_y = (pinky_tip[1] - 10) // (self.color_palette.shape[0] // len(self.colors))
-                        
-                        # Make sure rel_y is in valid range
-                        if 0 <= rel_y < len(self.colors):
-                            # Get color name from list of colors (keys of self.colors dict, ordered)
-                            color_names = list(self.colors.values())
-                            new_color = color_names[rel_y]
-                            
-                            if new_color != self.current_color:
-                                self.current_color = new_color
-                                self.status_var.set(f"Current Color: {self.current_color}")
-                                self.status_bar.config(text=f"Color selected: {self.current_color}")
-                    
-                    # Draw a circle at the index finger tip
-                    cv2.circle(frame, index_tip, 10, (0, 255, 0), -1)
-                    
-                    # Map the finger coordinates to the canvas
-                    canvas_x, canvas_y = index_tip
-                    
-                    # Drawing mode depends on thumb extension
-                    current_mode = self.mode_var.get()
-                    
-                    if thumb_is_extended:
-                        # Draw mode (thumb is extended)
-                        cv2.circle(frame, thumb_tip, 10, (0, 0, 255), -1)
-                        cv2.putText(frame, "Drawing Mode", (frame_w - 150, 30), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
-                        
-                        if not self.drawing:
-                            self.drawing = True
-                            self.prev_x, self.prev_y = None, None
-                            self.start_point = (canvas_x, canvas_y)
-                            self.status_bar.config(text=f"Drawing with {self.current_color}. Mode: {current_mode}")
-                        
-                        if current_mode == "draw":
-                            # Free drawing mode
-                            if self.prev_x is not None and self.prev_y is not None:
-                                self.canvas.create_line(
-                                    self.prev_x, self.prev_y, canvas_x, canvas_y,
-                                    width=self.brush_size_var.get(), fill=self.current_color, 
-                                    capstyle=tk.ROUND, smooth=True
-                                )
-                                self.lines_drawn += 1
-                        elif current_mode == "line" and self.start_point is not None:
-                            # Line drawing mode
-                            self.canvas.delete("temp_shape")
-                            self.canvas.create_line(
-                                self.start_point[0], self.start_point[1], canvas_x, canvas_y,
-                                width=self.brush_size_var.get(), fill=self.current_color,
-                                tags="temp_shape"
-                            )
-                        elif current_mode == "rectangle" and self.start_point is not None:
-                            # Rectangle drawing mode
-                            self.canvas.delete("temp_shape")
-                            self.canvas.create_rectangle(
-                                self.start_point[0], self.start_point[1], canvas_x, canvas_y,
-                                width=self.brush_size_var.get(), outline=self.current_color,
-                                tags="temp_shape"
-                            )
-                        elif current_mode == "circle" and self.start_point is not None:
-                            # Circle drawing mode
-                            self.canvas.delete("temp_shape")
-                            radius = ((canvas_x - self.start_point[0])**2 + 
-                                      (canvas_y - self.start_point[1])**2)**0.5
-                            self.canvas.create_oval(
-                                self.start_point[0] - radius, self.start_point[1] - radius,
-                                self.start_point[0] + radius, self.start_point[1] + radius,
-                                width=self.brush_size_var.get(), outline=self.current_color,
-                                tags="temp_shape"
-                            )
-                        
-                        self.prev_x, self.prev_y = canvas_x, canvas_y
-                    else:
-                        # Not drawing mode (thumb is down/sideways)
-                        if self.drawing:
-                            # Finish the shape if we were drawing one
-                            if current_mode != "draw" and self.start_point is not None:
-                                self.canvas.delete("temp_shape")
-                                if current_mode == "line":
-                                    self.canvas.create_line(
-                                        self.start_point[0], self.start_point[1], self.prev_x, self.prev_y,
-                                        width=self.brush_size_var.get(), fill=self.current_color
-                                    )
-                                elif current_mode == "rectangle":
-                                    self.canvas.create_rectangle(
-                                        self.start_point[0], self.start_point[1], self.prev_x, self.prev_y,
-                                        width=self.brush_size_var.get(), outline=self.current_color
-                                    )
-                                elif current_mode == "circle":
-                                    radius = ((self.prev_x - self.start_point[0])**2 + 
-                                             (self.prev_y - self.start_point[1])**2)**0.5
-                                    self.canvas.create_oval(
-                                        self.start_point[0] - radius, self.start_point[1] - radius,
-                                        self.start_point[0] + radius, self.start_point[1] + radius,
-                                        width=self.brush_size_var.get(), outline=self.current_color
-                                    )
-                                self.lines_drawn += 1
-                            
-                            self.drawing = False
-                            self.start_point = None
-                            self.status_bar.config(text="Guidance mode. Thumb up to start drawing.")
-                        
-                        # Draw a guidance point on the canvas
-                        self.canvas.delete("guidance_point")
-                        self.canvas.create_oval(
-                            canvas_x - 5, canvas_y - 5, canvas_x + 5, canvas_y + 5,
-                            fill="gray", outline="black", tags="guidance_point"
+                with profiler.span("draw_landmarks"):
+                    for hand_landmarks in results.multi_hand_landmarks:
+                        self.mp_drawing.draw_landmarks(
+                            frame, 
+                            hand_landmarks, 
+                            self.mp_hands.HAND_CONNECTIONS,
+                            self.landmark_style,
+                            self.connection_style
                         )
-                        
-                        # Display guidance mode in frame
-                        cv2.putText(frame, "Guidance Mode", (frame_w - 150, 30), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (128, 128, 128), 2)
+        except Exception:
+            # The pipeline skips this frame, so hand its buffer back
+            self.frame_path.release(frame)
+            raise
+        
+        return frame, results
+    
+    def update_session_timer(self):
+        """Show how long the session has been running, once a second"""
+        elapsed = int((datetime.now() - self.session_start).total_seconds())
+        hours, rest = divmod(elapsed, 3600)
+        minutes, seconds = divmod(rest, 60)
+        self.session_var.set(f"Session: {hours:02d}:{minutes:02d}:{seconds:02d} | "
+                             f"Lines: {self.gestures.lines_drawn}")
+        self.root.after(1000, self.update_session_timer)
+    
+    def toggle_hud(self):
+        """Show or hide the HUD; profiling only runs while it is needed"""
+        show = self.hud_var.get()
+        self.profiler.enabled = show or bool(self.trace_file)
+        self.canvas.itemconfig(self.hud_item, state=tk.NORMAL if show else tk.HIDDEN)
+        if show:
+            self.canvas.tag_raise(self.hud_item)
+    
+    def update_hud(self, stats):
+        lines = [f"FPS  capture {stats['capture_fps']:5.1f}  inference {stats['inference_fps']:5.1f}  "
+                 f"display {self.display_rate.rate():5.1f}"]
+        for name, stage in self.profiler.summary().items():
+            lines.append(f"{name:<15}{stage['p50']:7.2f} ms  p99 {stage['p99']:7.2f} ms")
+        self.canvas.itemconfig(self.hud_item, text="\n".join(lines))
+    
+    def update_perf_stats(self):
+        """Show capture/inference throughput, refreshed twice a second"""
+        now = time.perf_counter()
+        if now - self.last_perf_update < 0.5:
+            return
+        self.last_perf_update = now
+        stats = self.pipeline.stats()
+        text = (
+            f"Capture: {stats['capture_fps']:.1f} fps | "
+            f"Inference: {stats['inference_fps']:.1f} fps | "
+            f"Dropped: {stats['dropped_frames']}/{stats['dropped_results']} | "
+            f"Tiles: {len(self.raster.tiles)} ({self.raster.memory_bytes / 2**20:.1f} MiB)"
+        )
+        if isinstance(self.tracker, FrameSkippingTracker):
+            text += (f" | Model: {self.tracker.inference_rate.rate():.1f} fps, "
+                     f"every {self.tracker.interval()} frames")
+        self.perf_var.set(text)
+        if self.hud_var.get():
+            self.update_hud(stats)
+    
+    def show_video(self, frame):
+        """Blit an RGB frame into the persistent video PhotoImage"""
+        # fromarray wraps the buffer without copying, paste() is the only copy into Tk
+        img = Image.fromarray(frame)
+        if self.video_photo is None or (self.video_photo.width(), self.video_photo.height()) != img.size:
+            self.video_photo = ImageTk.PhotoImage(image=img)
+            self.video_label.configure(image=self.video_photo, text="")
+        else:
+            self.video_photo.paste(img)
+    
+    def update_frame(self):
+        """Apply the latest hand tracking result to the canvas and video display"""
+        item = self.pipeline.poll()
+        if item is not None:
+            frame, results = item
+            frame_h, frame_w, _ = frame.shape
+            
+            # Apply gestures for each tracked hand
+            with self.profiler.span("gestures"):
+                try:
+                    self.gestures.process(results, frame_w, frame_h, self.mode_var.get(),
+                                          self.brush_size_var.get(), frame=frame)
+                except Exception as e:  # keep the frame loop scheduled, see the status bar
+                    self.status_bar.config(text=f"Gesture error: {e}")
             
-            # Convert the frame to a format suitable for tkinter
-            img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            imgtk = ImageTk.PhotoImage(image=img)
-            self.video_label.imgtk = imgtk
-            self.video_label.configure(image=imgtk)
+            with self.profiler.span("video"):
+                self.show_video(frame)
+            self.frame_path.release(frame)
+            self.display_rate.tick()
+        
+        error = self.pipeline.take_error()
+        if error is not None:
+            self.status_bar.config(text=f"Hand tracking error ({self.pipeline.errors} so far): {error}")
         
-        # Schedule the next update
-        self.root.after(10, self.update_frame)
+        with self.profiler.span("raster"):
+            self.refresh_raster()
+        self.update_perf_stats()
+        
+        # Poll again soon, the heavy lifting happens on the pipeline threads
+        self.root.after(5, self.update_frame)
     
     def on_closing(self):
         """Handle cleanup when the application is closed"""
-        self.cap.release()
-        self.hands.close()
+        if self.pipeline is not None:
+            self.pipeline.stop()
+        if self.trace_file:
+            self.profiler.export_chrome_trace(self.trace_file)
+        
+        # A loader still running cleans up after itself; a finished one was never taken over
+        self.loader.cancelled = True
+        if self.loader.done.is_set() and self.loader.hands is not self.hands:
+            self.loader.release()
+        
+        if isinstance(self.tracker, FrameSkippingTracker):
+            self.tracker.close()
+        if self.cap is not None:
+            self.cap.release()
+        if self.hands is not None:
+            self.hands.close()
+        self.hands_cache.close()
+        for sink in self.sinks:
+            sink.close()
         self.root.destroy()
 
+def parse_hand_modes(value):
+    """argparse type for --hand-modes"""
+    modes = [mode.strip() for mode in value.split(",")]
+    for mode in modes:
+        if mode != "draw" and mode not in SHAPE_MODES:
+            raise argparse.ArgumentTypeError(f"unknown drawing mode: {mode}")
+    return modes
+
+
+def parse_address(value):
+    """argparse type for --broadcast: HOST:PORT"""
+    host, _, port = value.rpartition(":")
+    if not host or not port.isdigit():
+        raise argparse.ArgumentTypeError(f"expected HOST:PORT, got {value}")
+    return host, int(port)
+
+
+def open_event_sinks(args):
+    """Event logger and broadcaster requested on the command line"""
+    sinks = []
+    if args.log_events:
+        sinks.append(EventLogger(args.log_events))
+    if args.broadcast:
+        sinks.append(EventBroadcaster(*args.broadcast))
+    return sinks
+
+
+def parse_size(value):
+    """argparse type for WxH sizes"""
+    try:
+        width, height = (int(part) for part in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WxH, got {value}")
+    if width < 1 or height < 1:
+        raise argparse.ArgumentTypeError(f"size must be positive, got {value}")
+    return width, height
+
+
+def parse_positive_int(value):
+    """argparse type for counts that must be at least 1"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected an integer, got {value}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
+def parse_non_negative_int(value):
+    """argparse type for options where 0 has a meaning of its own"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected an integer, got {value}")
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must not be negative, got {value}")
+    return number
+
+
 # Run the application
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Advanced Hand Gesture Drawing")
+    parser.add_argument("--queue-depth", type=parse_positive_int, default=1,
+                        help="Frames buffered between pipeline stages")
+    parser.add_argument("--drop-policy", choices=LatestFrameQueue.DROP_POLICIES, default="oldest",
+                        help="What to do with frames when a stage falls behind")
+    parser.add_argument("--palette-layout", choices=PaletteOverlay.LAYOUTS, default="vertical",
+                        help="How the color cells are arranged on the video feed")
+    parser.add_argument("--inference-size", type=parse_non_negative_int, default=320,
+                        help="Longest side of the image passed to MediaPipe, 0 keeps full resolution")
+    parser.add_argument("--roi", action="store_true",
+                        help="Run MediaPipe on a crop around the tracked hand instead of the whole frame "
+                             "(experimental)")
+    parser.add_argument("--skip", type=parse_non_negative_int, default=1,
+                        help="Run MediaPipe every N frames and predict landmarks in between, "
+                             "0 adapts N to the inference latency")
+    parser.add_argument("--camera", type=parse_non_negative_int, default=None,
+                        help="Camera index (default 0; --benchmark-startup only opens one if given)")
+    parser.add_argument("--reload-model", action="store_true",
+                        help="Load a fresh hand model on New Session instead of reusing the loaded one")
+    parser.add_argument("--canvas-size", type=parse_size, default=(4096, 4096), metavar="WxH",
+                        help="Drawing canvas size in pixels, pan and zoom to move around it "
+                             "(default 4096x4096, memory is only used where you draw)")
+    parser.add_argument("--max-hands", type=parse_positive_int, default=1,
+                        help="Number of hands tracked and drawing at the same time")
+    parser.add_argument("--hand-modes", type=parse_hand_modes, metavar="MODES",
+                        help="Comma-separated drawing mode per hand, e.g. draw,line "
+                             "(hands not listed use the selected mode)")
+    parser.add_argument("--log-events", metavar="FILE",
+                        help="Append every gesture event to FILE as JSON lines")
+    parser.add_argument("--broadcast", type=parse_address, metavar="HOST:PORT",
+                        help="Send each frame's gesture events as a JSON UDP datagram")
+    
+    headless = parser.add_argument_group("headless replay")
+    source = headless.add_mutually_exclusive_group()
+    source.add_argument("--replay", metavar="VIDEO",
+                        help="Run without a camera or display on a recorded video")
+    source.add_argument("--replay-landmarks", metavar="FILE",
+                        help="Run without a camera or display on a JSON-lines landmark recording")
+    source.add_argument("--load-session", metavar="FILE",
+                        help="Render a saved session (.jsonl or .npz), e.g. to --output-png")
+    headless.add_argument("--mode", choices=["draw"] + list(SHAPE_MODES), default="draw",
+                          help="Drawing mode used for the replay")
+    headless.add_argument("--brush-size", type=parse_positive_int, default=3)
+    headless.add_argument("--record-landmarks", metavar="FILE",
+                          help="Save the landmarks detected in --replay for later --replay-landmarks runs")
+    headless.add_argument("--output-strokes", metavar="FILE",
+                          help="Save the strokes as a session file (.jsonl or .npz)")
+    headless.add_argument("--output-png", metavar="FILE", help="Write the resulting drawing as PNG")
+    headless.add_argument("--check-skip", action="store_true",
+                          help="Also replay --replay-landmarks on every frame and fail if --skip "
+                               "changed the number of strokes")
+    headless.add_argument("--benchmark", action="store_true",
+                          help="Print per-stage latency percentiles")
+    headless.add_argument("--measure-allocations", action="store_true",
+                          help="Report per-frame allocations and GC collections for --replay (slow)")
+    headless.add_argument("--benchmark-output", metavar="FILE",
+                          help="Write the benchmark results as JSON")
+    
+    engine = parser.add_argument_group("multi-source engine")
+    engine.add_argument("--serve", nargs="+", metavar="SOURCE",
+                        help="Run capture, tracking and gestures for several cameras (index) "
+                             "or videos (path) on a process pool")
+    engine.add_argument("--workers", type=parse_positive_int, default=None,
+                        help="Worker processes for --serve (default: one per core, at most one per source)")
+    engine.add_argument("--engine-queue", type=parse_positive_int, default=64,
+                        help="Event batches buffered before workers wait for the renderers")
+    engine.add_argument("--serve-output", metavar="DIR",
+                        help="Write each source's strokes and PNG to DIR when --serve ends")
+    parser.add_argument("--profile", action="store_true",
+                        help="Start with the performance HUD (per-stage timings) shown")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="Record every pipeline stage and write a Chrome trace JSON on exit")
+    parser.add_argument("--benchmark-hands", type=parse_positive_int, nargs="?", const=4, metavar="N",
+                        help="Time gesture processing with 1..N synthetic hands (default 4)")
+    parser.add_argument("--benchmark-startup", action="store_true",
+                        help="Time imports, hand model loading (cold and warm) and camera opening")
+    parser.add_argument("--benchmark-preview", action="store_true",
+                        help="Compare shape preview strategies on a synthetic finger path (needs a display)")
+    args = parser.parse_args()
+    
+    if args.benchmark_preview:
+        results = benchmark_preview()
+        print(f"{'strategy':<12}{'mean':>10}{'p50':>10}{'p99':>10}{'items':>10}")
+        for name, stats in results.items():
+            print(f"{name:<12}{stats['mean']:>10.3f}{stats['p50']:>10.3f}{stats['p99']:>10.3f}"
+                  f"{stats['items_created']:>10}")
+        raise SystemExit(0)
+    
+    if args.benchmark_startup:
+        try:
+            results = benchmark_startup(args.max_hands, camera=args.camera)
+        except OSError as e:
+            raise SystemExit(f"Startup benchmark failed: {e}")
+        for stage, seconds in results.items():
+            print(f"{stage:<22}{seconds * 1000:10.1f} ms")
+        raise SystemExit(0)
+    
+    if args.benchmark_hands:
+        profiler, strokes = benchmark_hands(args.benchmark_hands)
+        print(profiler.report())
+        print("strokes: " + ", ".join(f"{name} {count}" for name, count in strokes.items()))
+        raise SystemExit(0)
+    
+    if args.serve:
+        run_engine(args)
+        raise SystemExit(0)
+    
+    if args.replay or args.replay_landmarks or args.load_session:
+        run_headless(args)
+        raise SystemExit(0)
+    
     root = tk.Tk()
-    app = AdvancedHandGestureDrawingApp(root)
+    app = AdvancedHandGestureDrawingApp(root, queue_depth=args.queue_depth,
+                                        drop_policy=args.drop_policy,
+                                        palette_layout=args.palette_layout,
+                                        inference_size=args.inference_size,
+                                        use_roi=args.roi,
+                                        skip=args.skip,
+                                        profile=args.profile,
+                                        trace_file=args.trace,
+                                        max_hands=args.max_hands,
+                                        hand_modes=args.hand_modes,
+                                        canvas_size=args.canvas_size,
+                                        camera=0 if args.camera is None else args.camera,
+                                        reload_model=args.reload_model,
+                                        sinks=open_event_sinks(args))
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
     root.mainloop()
\ No newline at end of file